@@ -0,0 +1,2 @@
+# -*- coding=UTF-8 -*-
+"""Benchmarks for uploader, run with `python -m benchmarks.<name>`.  """
@@ -0,0 +1,203 @@
+# -*- coding=UTF-8 -*-
+"""Benchmark `Controller` refresh and upload against a fake server.
+
+Each file count runs in a fresh process so peak memory is not shared,
+results are written as json for tracking across releases.
+
+Usage:
+    python -m benchmarks.controller [--latency SECONDS]
+        [--output results.json] [COUNT ...]
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.util import names
+
+PIPELINE = '输出'
+# One in this many shots has no task on server.
+MISSING_EVERY = 50
+UPLOAD_COUNT = 100
+UPLOAD_FILE_SIZE = 4 * 1024 * 1024
+TIMEOUT = 600
+
+
+def _wait(condition, timeout=TIMEOUT):
+    from Qt.QtCore import QCoreApplication
+
+    start = time.time()
+    while not condition():
+        if time.time() - start > timeout:
+            raise RuntimeError('Benchmark timeout.')
+        QCoreApplication.processEvents()
+        time.sleep(0.005)
+
+
+def _make_files(directory, count, size):
+    files = names(count)
+    for i in files:
+        with open(os.path.join(directory, i), 'wb') as f:
+            # Sparse file, costs no disk space until uploaded.
+            f.truncate(size)
+    return files
+
+
+def run(count, latency, upload_count=UPLOAD_COUNT,
+        upload_size=UPLOAD_FILE_SIZE):
+    """Run benchmark for one file count in current process.
+
+    Args:
+        count (int): File count.
+        latency (float): Fake server latency per call in seconds.
+        upload_count (int, optional): Defaults to UPLOAD_COUNT.
+            Max files to upload.
+        upload_size (int, optional): Defaults to UPLOAD_FILE_SIZE.
+            Size of each uploaded file.
+
+    Returns:
+        dict: Benchmark result.
+    """
+
+    # pylint: disable=too-many-locals
+    workspace = tempfile.mkdtemp(prefix='uploader-bench-')
+    try:
+        # Keep cache, manifest and config away from user home.
+        os.environ[str('HOME')] = workspace
+        directory = os.path.join(workspace, 'shots')
+        os.makedirs(directory)
+        files = _make_files(directory, count, upload_size)
+
+        from wlf.path import PurePath
+        from benchmarks import fake_cgtwq
+        from benchmarks.util import application, rss
+
+        shots = sorted(set(PurePath(i).shot for i in files))
+        server = fake_cgtwq.FakeServer(
+            [j for i, j in enumerate(shots) if i % MISSING_EVERY],
+            os.path.join(workspace, 'server'), latency)
+        fake_cgtwq.install(server)
+
+        app = application()
+        from cgtwq_uploader.__about__ import __version__
+        from cgtwq_uploader.control import Controller
+
+        rss_start = rss()
+        controller = Controller()
+        controller.pipeline = PIPELINE
+
+        def _is_done():
+            return (not controller.is_updating
+                    and not controller._pending_states  # pylint: disable=protected-access
+                    and controller.model.rowCount(
+                        controller.model.root_index()) > 0)
+
+        ret = {'files': count, 'latency': latency, 'version': __version__}
+
+        start = time.time()
+        controller.change_root(directory)
+        _wait(_is_done)
+        ret['refresh_cold_s'] = time.time() - start
+        ret['calls_cold'] = server.total_calls()
+        ret['calls_per_file_cold'] = ret['calls_cold'] / count
+        ret['calls_detail_cold'] = dict(server.calls)
+        ret['rows'] = controller.model.rowCount(controller.model.root_index())
+
+        server.reset_calls()
+        start = time.time()
+        controller.update_model()
+        _wait(_is_done)
+        ret['refresh_warm_s'] = time.time() - start
+        ret['calls_warm'] = server.total_calls()
+        ret['calls_per_file_warm'] = ret['calls_warm'] / count
+
+        controller.select_all()
+        tasks = controller.tasks()[:upload_count]
+        server.reset_calls()
+        start = time.time()
+        controller.uploader.start(tasks)
+        controller.uploader.wait(TIMEOUT)
+        elapsed = time.time() - start
+        size = sum(os.path.getsize(i.src) for i in tasks)
+        ret['upload_files'] = len(tasks)
+        ret['upload_bytes'] = size
+        ret['upload_s'] = elapsed
+        ret['upload_files_per_s'] = len(tasks) / elapsed if elapsed else None
+        ret['upload_mb_per_s'] = (
+            size / elapsed / 1024 / 1024 if elapsed else None)
+        ret['calls_upload'] = server.total_calls()
+
+        ret['rss_delta_mb'] = (rss() - rss_start) / 1024 / 1024
+        ret['peak_rss_mb'] = resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss / 1024
+        controller.close()
+        del app
+        return ret
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def _parser():
+    ret = argparse.ArgumentParser(prog='benchmarks.controller')
+    ret.add_argument('counts', nargs='*', type=int,
+                     default=[100, 1000, 10000])
+    ret.add_argument('--latency', type=float, default=0.02,
+                     help='fake server latency per call in seconds')
+    ret.add_argument('--upload-count', type=int, default=UPLOAD_COUNT)
+    ret.add_argument('--upload-size', type=int, default=UPLOAD_FILE_SIZE)
+    ret.add_argument('--output', help='write json results to this file')
+    ret.add_argument('--single', action='store_true',
+                     help='run first count in current process, '
+                     'print json result')
+    return ret
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    if args.single:
+        result = run(args.counts[0], args.latency,
+                     args.upload_count, args.upload_size)
+        json.dump(result, sys.stdout, sort_keys=True)
+        return
+
+    results = []
+    for count in args.counts:
+        output = subprocess.check_output(
+            [sys.executable, '-m', 'benchmarks.controller', '--single',
+             '--latency', str(args.latency),
+             '--upload-count', str(args.upload_count),
+             '--upload-size', str(args.upload_size), str(count)])
+        result = json.loads(output.decode('utf-8').splitlines()[-1])
+        results.append(result)
+        print('{files:>6} files: refresh {refresh_cold_s:.2f}s cold '
+              '{refresh_warm_s:.2f}s warm, '
+              '{calls_per_file_cold:.3f} calls/file, '
+              'upload {upload_mb_per_s:.1f} MiB/s, '
+              'peak {peak_rss_mb:.0f} MiB'.format(**result))
+    data = {
+        'version': results[0]['version'] if results else None,
+        'time': time.time(),
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    else:
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# -*- coding=UTF-8 -*-
+"""Local stand-in for CGTeamWork server, no network needed.
+
+Call `install` before importing `cgtwq_uploader`, it replaces `cgtwq`
+modules in `sys.modules` with fakes backed by a `FakeServer`.
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import sys
+import threading
+import time
+import types
+from collections import Counter
+
+from wlf.path import PurePath
+
+ACCOUNT_ID = 'bench'
+DATABASE = 'proj_bench'
+MODULE = 'shot'
+
+
+class FakeServer(object):
+    """In-memory entries with per-call latency.
+
+    Args:
+        shots (Iterable[str]): Shots that have a task.
+        submit_root (str): Directory for submit fileboxes.
+        latency (float, optional): Defaults to 0.02. Seconds per call.
+    """
+
+    def __init__(self, shots, submit_root, latency=0.02):
+        self.latency = latency
+        self.submit_root = submit_root
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self.entries = {}
+        for i, shot in enumerate(sorted(set(shots))):
+            self.entries[shot.lower()] = (
+                'id-{}'.format(i), shot, ACCOUNT_ID, 'Bench')
+        self._by_id = {v[0]: v for v in self.entries.values()}
+
+    def call(self, name):
+        """Record a server call then wait for latency.  """
+
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def total_calls(self):
+        """Total count of server calls.  """
+
+        with self._lock:
+            return sum(self.calls.values())
+
+    def reset_calls(self):
+        """Clear call counter.  """
+
+        with self._lock:
+            self.calls.clear()
+
+
+class _Expr(object):
+
+    def __init__(self, **kwargs):
+        self.values = kwargs
+
+    def __and__(self, other):
+        return _Expr(**dict(self.values, **other.values))
+
+
+class _Field(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, other):
+        return _Expr(**{self.name: other})
+
+    __hash__ = object.__hash__
+
+    def in_(self, values):
+        return _Expr(**{self.name: list(values)})
+
+
+def _make_modules(server):
+    # pylint: disable=too-many-locals,missing-docstring
+
+    class LoginError(Exception):
+        pass
+
+    class AccountError(Exception):
+        owner = None
+        current = None
+
+    class IDError(Exception):
+        pass
+
+    class DatabaseError(Exception):
+        pass
+
+    class Message(object):
+        def __init__(self, text=''):
+            self.text = text
+            self.images = []
+
+    class Flow(object):
+        def __init__(self, entry):
+            self.entry = entry
+
+        def submit(self, pathnames, message=None):
+            # pylint: disable=unused-argument
+            server.call('flow.submit')
+
+    class FileBox(object):
+        def __init__(self, entry):
+            self.entry = entry
+
+        def get_submit(self):
+            server.call('filebox.get_submit')
+            path = os.path.join(server.submit_root, self.entry.data[1])
+            if not os.path.isdir(path):
+                try:
+                    os.makedirs(path)
+                except OSError:
+                    pass
+            return _Namespace(path=path)
+
+    class Entry(object):
+        def __init__(self, module, data):
+            self.module = module
+            self.data = data
+            self.flow = Flow(self)
+            self.filebox = FileBox(self)
+
+        def __getitem__(self, key):
+            if key == 0:
+                return self.data[0]
+            return self.data[{'account_id': 2, 'artist': 3}[key]]
+
+        def set_image(self, path):
+            server.call('entry.set_image')
+            return path
+
+    class Selection(object):
+        def __init__(self, module, ids):
+            self.module = module
+            self.ids = ids
+
+        def __bool__(self):
+            return bool(self.ids)
+
+        __nonzero__ = __bool__
+
+        def get_fields(self, *fields):
+            # pylint: disable=unused-argument
+            server.call('select.get_fields')
+            return [list(server._by_id[i]) for i in self.ids]
+
+        def to_entry(self):
+            return Entry(self.module, server._by_id[self.ids[0]])
+
+    class Module(object):
+        def __init__(self, database, name):
+            self.database = database
+            self.name = name
+
+        def filter(self, expr):
+            server.call('module.filter')
+            shots = [i.lower() for i in expr.values.get('shot.entity', ())]
+            return Selection(self, [server.entries[i][0] for i in shots
+                                    if i in server.entries])
+
+        def select(self, *ids):
+            return Selection(self, list(ids))
+
+    class Database(object):
+        def __init__(self, name):
+            self.name = name
+
+        def module(self, name):
+            return Module(self, name)
+
+    class DesktopClient(object):
+        @staticmethod
+        def is_logged_in():
+            return True
+
+        @staticmethod
+        def connect():
+            server.call('client.connect')
+            core.CONFIG['DEFAULT_TOKEN'] = 'bench-token'
+
+    def get_account_id():
+        server.call('get_account_id')
+        return ACCOUNT_ID
+
+    def get_entry_by_file(filename, pipeline):
+        # pylint: disable=unused-argument
+        server.call('get_entry_by_file')
+        data = server.entries.get(PurePath(filename).shot.lower())
+        if data is None:
+            raise ValueError('Empty selection.')
+        return Entry(Database(DATABASE).module(MODULE), data)
+
+    def ask_login(parent=None):
+        raise LoginError(parent)
+
+    root = types.ModuleType(str('cgtwq'))
+    core = types.ModuleType(str('cgtwq.core'))
+    helper = types.ModuleType(str('cgtwq.helper'))
+    helper_wlf = types.ModuleType(str('cgtwq.helper.wlf'))
+    helper_qt = types.ModuleType(str('cgtwq.helper.qt'))
+
+    core.CONFIG = {'DEFAULT_TOKEN': None}
+    for k, v in dict(
+            core=core, helper=helper, LoginError=LoginError,
+            AccountError=AccountError, IDError=IDError, Message=Message,
+            Entry=Entry, Database=Database, Field=_Field,
+            DesktopClient=DesktopClient,
+            get_account_id=get_account_id).items():
+        setattr(root, k, v)
+    helper.wlf = helper_wlf
+    helper.qt = helper_qt
+    helper_wlf.get_entry_by_file = get_entry_by_file
+    helper_wlf.DatabaseError = DatabaseError
+    helper_qt.ask_login = ask_login
+    return {
+        'cgtwq': root,
+        'cgtwq.core': core,
+        'cgtwq.helper': helper,
+        'cgtwq.helper.wlf': helper_wlf,
+        'cgtwq.helper.qt': helper_qt,
+    }
+
+
+class _Namespace(object):
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def install(server):
+    """Replace `cgtwq` with fakes backed by server.
+
+    Args:
+        server (FakeServer): Server for fake api.
+    """
+
+    assert 'cgtwq_uploader.control' not in sys.modules, (
+        'Install fake before importing uploader.')
+    sys.modules.update(_make_modules(server))
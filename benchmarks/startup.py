@@ -0,0 +1,155 @@
+# -*- coding=UTF-8 -*-
+"""Benchmark dialog startup against a fake server.
+
+Each run starts a fresh interpreter, so import time is included.
+Use `--source` to time another checkout, e.g. a baseline worktree.
+
+Usage:
+    python -m benchmarks.startup [--latency SECONDS] [--runs N]
+        [--source DIR] [--output results.json]
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+FILE_COUNT = 100
+TIMEOUT = 120
+
+
+def run(latency, count=FILE_COUNT):
+    """Run startup once in current process.
+
+    Args:
+        latency (float): Fake server latency per call in seconds.
+        count (int, optional): Defaults to FILE_COUNT. Files in directory.
+
+    Returns:
+        dict: Seconds from start to each milestone.
+    """
+
+    # pylint: disable=too-many-locals
+    start = time.time()
+    workspace = tempfile.mkdtemp(prefix='uploader-bench-')
+    try:
+        os.environ[str('HOME')] = workspace
+        directory = os.path.join(workspace, 'shots')
+        os.makedirs(directory)
+
+        from benchmarks.util import application, names
+        for i in names(count):
+            open(os.path.join(directory, i), 'w').close()
+
+        from wlf.path import PurePath
+        from benchmarks import fake_cgtwq
+        fake_cgtwq.install(fake_cgtwq.FakeServer(
+            [PurePath(i).shot for i in names(count)],
+            os.path.join(workspace, 'server'), latency))
+
+        from Qt.QtCore import QCoreApplication, QEvent, QObject
+        app = application()
+        ret = {'latency': latency, 'files': count}
+
+        begin = time.time()
+        from cgtwq_uploader.util import CONFIG
+        from cgtwq_uploader.view import Dialog
+        ret['import_s'] = time.time() - begin
+        ret['import_modules'] = len(sys.modules)
+
+        CONFIG['DIR'] = directory
+        painted = []
+
+        class _PaintFilter(QObject):
+            # pylint: disable=too-few-public-methods
+
+            def eventFilter(self, obj, event):
+                # pylint: disable=invalid-name,unused-argument
+                if event.type() == QEvent.Paint and not painted:
+                    painted.append(time.time())
+                return False
+
+        paint_filter = _PaintFilter()
+        dialog = Dialog()
+        dialog.installEventFilter(paint_filter)
+        dialog.show()
+        while True:
+            QCoreApplication.processEvents()
+            # Older versions create controller in dialog `__init__`.
+            controller = getattr(dialog, 'controller', None)
+            if (painted and controller is not None
+                    and not getattr(controller, 'is_updating', False)):
+                break
+            if time.time() - begin > TIMEOUT:
+                raise RuntimeError('Benchmark timeout.')
+            time.sleep(0.001)
+        ready = time.time()
+        ret['first_paint_s'] = painted[0] - begin
+        ret['ready_s'] = ready - begin
+        ret['process_s'] = ready - start
+        dialog.close()
+        del app
+        return ret
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def _parser():
+    ret = argparse.ArgumentParser(prog='benchmarks.startup')
+    ret.add_argument('--latency', type=float, default=0.05,
+                     help='fake server latency per call in seconds')
+    ret.add_argument('--runs', type=int, default=5)
+    ret.add_argument('--files', type=int, default=FILE_COUNT)
+    ret.add_argument('--source',
+                     help='import cgtwq_uploader from this checkout')
+    ret.add_argument('--output', help='write json results to this file')
+    ret.add_argument('--single', action='store_true',
+                     help='run once in current process, print json result')
+    return ret
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    if args.source:
+        # Before current directory, which `-m` puts first.
+        sys.path.insert(0, args.source)
+    if args.single:
+        json.dump(run(args.latency, args.files), sys.stdout, sort_keys=True)
+        return
+
+    command = [sys.executable, '-m', 'benchmarks.startup', '--single',
+               '--latency', str(args.latency), '--files', str(args.files)]
+    if args.source:
+        command += ['--source', os.path.abspath(args.source)]
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.check_output(command)
+        result = json.loads(output.decode('utf-8').splitlines()[-1])
+        results.append(result)
+        print('import {import_s:.3f}s, first paint {first_paint_s:.3f}s, '
+              'ready {ready_s:.3f}s'.format(**result))
+    data = {
+        'time': time.time(),
+        'python': sys.version.split()[0],
+        'source': args.source,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    else:
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# -*- coding=UTF-8 -*-
+"""Shared helpers for benchmarks.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import tempfile
+
+from six.moves import range
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+VERSIONS_PER_SHOT = 5
+
+
+def names(count):
+    """Synthetic versioned file names.
+
+    Args:
+        count (int): File count.
+
+    Returns:
+        list[str]: File names.
+    """
+
+    return ['SNJYW_EP01_{:05d}_v{}.mov'.format(i // VERSIONS_PER_SHOT,
+                                                i % VERSIONS_PER_SHOT + 1)
+            for i in range(count)]
+
+
+def make_directory(count):
+    """Create a temporary directory filled with empty files.  """
+
+    ret = tempfile.mkdtemp(prefix='uploader-bench-')
+    for i in names(count):
+        open(os.path.join(ret, i), 'w').close()
+    return ret
+
+
+def application():
+    """Get or create offscreen application.  """
+
+    from Qt.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def load_directory(model, path):
+    """Set model root and wait until directory is loaded.
+
+    Args:
+        model (QFileSystemModel): Model to load.
+        path (str): Directory path.
+    """
+
+    from Qt.QtCore import QEventLoop, QTimer
+
+    loop = QEventLoop()
+    model.directoryLoaded.connect(
+        lambda i: i == model.rootPath() and QTimer.singleShot(0, loop.quit))
+    model.setRootPath(path)
+    loop.exec_()
+
+
+def rss():
+    """Resident memory of current process in bytes, Linux only.  """
+
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf(str('SC_PAGE_SIZE'))
@@ -0,0 +1,74 @@
+# -*- coding=UTF-8 -*-
+"""Benchmark version filtering on synthetic directories.
+
+Usage:
+    python -m benchmarks.version_filter [COUNT ...]
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import shutil
+import sys
+import timeit
+
+from wlf.fileutil import version_filter
+
+from benchmarks.util import application, load_directory, make_directory
+from cgtwq_uploader.model import (DirectoryModel, VersionFilterProxyModel,
+                                  VersionIndex)
+
+LEGACY_SAMPLE = 20
+
+
+def bench_legacy(files):
+    """Estimate cost of the old per-row `version_filter` call.  """
+
+    sample = files[:LEGACY_SAMPLE]
+    cost = timeit.timeit(
+        lambda: [i in version_filter(files) for i in sample], number=1)
+    return cost / len(sample) * len(files)
+
+
+def bench_index(files):
+    """Cost of building an index then looking up every file.  """
+
+    def _run():
+        index = VersionIndex(files)
+        for i in files:
+            index.is_latest(i)
+    return timeit.timeit(_run, number=1)
+
+
+def bench_proxy(path):
+    """Cost of loading a directory then refiltering through proxy model.  """
+
+    model = DirectoryModel()
+    proxy = VersionFilterProxyModel()
+    proxy.setSourceModel(model)
+    load_directory(model, path)
+    return timeit.timeit(proxy.invalidate, number=1)
+
+
+def main():
+    app = application()
+    counts = [int(i) for i in sys.argv[1:]] or [1000, 10000, 50000]
+    print('{:>8} {:>16} {:>12} {:>12}'.format(
+        'files', 'legacy(est.) s', 'index s', 'proxy s'))
+    for count in counts:
+        path = make_directory(count)
+        try:
+            files = sorted(os.listdir(path))
+            print('{:>8} {:>16.3f} {:>12.3f} {:>12.3f}'.format(
+                count,
+                bench_legacy(files),
+                bench_index(files),
+                bench_proxy(path)))
+        finally:
+            shutil.rmtree(path)
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,35 @@
 # -*- coding=UTF-8 -*-
-"""Upload files to server.  """
+"""Upload files to server.
+
+`Dialog` is imported from `cgtwq_uploader.view` on first access,
+so command line works without Qt.
+"""
 
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
-from .view import Dialog
+import sys
+import types
+
 from .__main__ import main
+
+
+class _Package(types.ModuleType):
+    """Package module with lazy attributes.  """
+
+    def __getattr__(self, name):
+        if name == 'Dialog':
+            from .view import Dialog
+            return Dialog
+        raise AttributeError(name)
+
+
+try:
+    sys.modules[__name__].__class__ = _Package
+except TypeError:
+    # Python 2 can not change class of a module, replace it instead.
+    # Old module is kept, otherwise its globals are cleared.
+    _PACKAGE = _Package(str(__name__), __doc__)
+    _PACKAGE.__dict__.update(sys.modules[__name__].__dict__)
+    _PACKAGE.__dict__['_origin'] = sys.modules[__name__]
+    sys.modules[__name__] = _PACKAGE
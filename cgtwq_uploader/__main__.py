@@ -4,16 +4,29 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
-from wlf.uitools import main_show_dialog
-from wlf import mp_logging
+import sys
 
-from .view import Dialog
+# Command line imports cgtwq, so it is imported only when used.
+COMMANDS = ('check', 'upload')
 
 
-def main():
+def main(argv=None):
+    """Show dialog, or run command line when a command is given.  """
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS + ('-h', '--help'):
+        from . import cli
+        return cli.main(argv)
+
+    # Import Qt only when dialog is needed.
+    from wlf.uitools import main_show_dialog
+    from wlf import mp_logging
+
+    from .view import Dialog
+
     mp_logging.basic_config()
     main_show_dialog(Dialog)
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# -*- coding=UTF-8 -*-
+"""Disk cache for resolve results.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import sqlite3
+import threading
+import time
+
+from six.moves import range
+
+from .resolve import Resolution
+
+# Limit of sqlite host parameters is 999 on old versions.
+_CHUNK_SIZE = 500
+
+
+def _chunks(items, size=_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class ResolveCache(object):
+    """Resolve results keyed by file name and pipeline.
+
+    Entries expire after `ttl` seconds,
+    least recently used entries are evicted when exceeds `size`.
+    """
+
+    path = os.path.expanduser('~/.wlf.uploader.cache.db')
+
+    def __init__(self, path=None, ttl=24 * 60 * 60, size=100000):
+        self.path = path or self.path
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS resolution ('
+                'filename TEXT, pipeline TEXT, database TEXT, module TEXT, '
+                'entry_id TEXT, submit_dir TEXT, account_id TEXT, '
+                'artist TEXT, error TEXT, updated REAL, accessed REAL, '
+                'PRIMARY KEY (filename, pipeline))')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS resolution_accessed '
+                'ON resolution (accessed)')
+
+    def get_many(self, filenames, pipeline):
+        """Get cached resolutions.
+
+        Args:
+            filenames (Iterable[str]): File names.
+            pipeline (str): Pipeline name.
+
+        Returns:
+            dict[str, Resolution]: Unexpired resolutions keyed by file name.
+        """
+
+        now = time.time()
+        ret = {}
+        with self._lock, self._conn:
+            for chunk in _chunks(filenames):
+                marks = ','.join('?' * len(chunk))
+                for row in self._conn.execute(
+                        'SELECT filename, pipeline, database, module, '
+                        'entry_id, submit_dir, account_id, artist, error '
+                        'FROM resolution WHERE pipeline = ? AND updated > ? '
+                        'AND filename IN ({})'.format(marks),
+                        [pipeline, now - self.ttl] + chunk):
+                    ret[row[0]] = Resolution(*row)
+            for chunk in _chunks(ret):
+                marks = ','.join('?' * len(chunk))
+                self._conn.execute(
+                    'UPDATE resolution SET accessed = ? '
+                    'WHERE pipeline = ? AND filename IN ({})'.format(marks),
+                    [now, pipeline] + chunk)
+        return ret
+
+    def stale(self, filenames, pipeline, seconds):
+        """Find cached resolutions saved more than `seconds` ago.
+
+        Args:
+            filenames (Iterable[str]): File names.
+            pipeline (str): Pipeline name.
+            seconds (float): Freshness window.
+
+        Returns:
+            set[str]: File names of stale resolutions.
+        """
+
+        ret = set()
+        with self._lock, self._conn:
+            for chunk in _chunks(filenames):
+                marks = ','.join('?' * len(chunk))
+                ret.update(row[0] for row in self._conn.execute(
+                    'SELECT filename FROM resolution '
+                    'WHERE pipeline = ? AND updated <= ? '
+                    'AND filename IN ({})'.format(marks),
+                    [pipeline, time.time() - seconds] + chunk))
+        return ret
+
+    def put_many(self, resolutions):
+        """Save resolutions then evict expired and least recently used.
+
+        Args:
+            resolutions (Iterable[Resolution]): Results to save.
+        """
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO resolution VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (tuple(i) + (now, now) for i in resolutions))
+            self._conn.execute(
+                'DELETE FROM resolution WHERE updated <= ?',
+                (now - self.ttl,))
+            self._conn.execute(
+                'DELETE FROM resolution WHERE rowid IN ('
+                'SELECT rowid FROM resolution ORDER BY accessed DESC '
+                'LIMIT -1 OFFSET ?)',
+                (self.size,))
+
+    def invalidate(self, filenames=None):
+        """Remove cached resolutions.
+
+        Args:
+            filenames (Iterable[str], optional): Defaults to None.
+                File names to remove, remove all when None.
+        """
+
+        with self._lock, self._conn:
+            if filenames is None:
+                self._conn.execute('DELETE FROM resolution')
+                return
+            for chunk in _chunks(filenames):
+                self._conn.execute(
+                    'DELETE FROM resolution WHERE filename IN ({})'.format(
+                        ','.join('?' * len(chunk))),
+                    chunk)
@@ -0,0 +1,240 @@
+# -*- coding=UTF-8 -*-
+"""Command line interface without Qt.
+
+Usage:
+    python -m cgtwq_uploader check --pipeline 合成 --dir DIR
+    python -m cgtwq_uploader upload --pipeline 合成 --dir DIR --submit
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import json
+import logging
+import os
+import sys
+from multiprocessing.dummy import Pool
+
+import six
+
+from .cache import ResolveCache
+from .core import (STATUS_LOCAL, check_file, current_account_id, list_files,
+                   reject_files)
+from .manifest import UploadManifest
+from .resolve import Resolution, resolve_files
+from .sequence import frame_dest, group_files, resolve_name
+from .stats import STATS
+from .upload import UploadScheduler, UploadTask
+from .util import CONFIG, l10n
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _text(value):
+    # Python 2 gives arguments as bytes.
+    if isinstance(value, six.binary_type):
+        return value.decode(sys.getfilesystemencoding() or 'utf-8')
+    return value
+
+
+def _parser():
+    ret = argparse.ArgumentParser(
+        prog='cgtwq_uploader', description='CGTeamWork 批量上传')
+    subparsers = ret.add_subparsers(dest='command')
+    for name, help_ in (('check', '检查文件状态'),
+                        ('upload', '上传所有等待上传的文件')):
+        parser = subparsers.add_parser(name, help=help_)
+        parser.add_argument('--dir', required=True, type=_text,
+                            help='文件所在文件夹')
+        parser.add_argument('--pipeline', default=CONFIG['PIPELINE'],
+                            type=_text, help='流程, 默认为上次使用的流程')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='不使用本地缓存的数据库查询结果')
+        parser.add_argument('--stats', action='store_true',
+                            help='输出各阶段耗时与计数')
+        if name == 'upload':
+            parser.add_argument('--submit', action='store_true',
+                                help='上传后提交')
+            parser.add_argument('--note', default='', type=_text,
+                                help='提交备注')
+    return ret
+
+
+def group(directory):
+    """Latest version files in directory, frames grouped as sequences.
+
+    Args:
+        directory (str): Directory path.
+
+    Returns:
+        tuple[list[str], dict[str, list[str]]]: File names and frame
+            names keyed by sequence name, a sequence is named without
+            frame number and listed once in file names.
+    """
+
+    files, frames = group_files(list_files(directory))
+    sequences = {resolve_name(k): v for k, v in frames.items()}
+    return files + list(sequences), sequences
+
+
+def resolve(names, pipeline, cache=None):
+    """Resolve files, a sequence is resolved once by its name.
+
+    Args:
+        names (list[str]): File names from `group`.
+        pipeline (str): Pipeline name.
+        cache (ResolveCache, optional): Defaults to None.
+            Use cached resolutions when given.
+
+    Returns:
+        list[Resolution]: Resolve results.
+    """
+
+    files, rejected = reject_files(names, pipeline)
+    cached = cache.get_many(files, pipeline) if cache else {}
+    pool = Pool(CONFIG['WORKERS'])
+    try:
+        resolved = list(resolve_files(
+            [i for i in files if i not in cached], pipeline, pool))
+    finally:
+        pool.close()
+    if cache:
+        cache.put_many(resolved)
+    return ([Resolution.failed(k, pipeline, v) for k, v in rejected.items()]
+            + list(cached.values()) + resolved)
+
+
+def check(directory, resolutions, current_id, manifest, sequences=None):
+    """Check resolved files in directory.
+
+    Args:
+        directory (str): Directory path.
+        resolutions (list[Resolution]): Resolve results.
+        current_id (str): Current account id.
+        manifest (UploadManifest): Upload record.
+        sequences (dict[str, list[str]], optional): Defaults to None.
+            Frame names keyed by sequence name, from `group`.
+
+    Returns:
+        list[FileState]: Check results, path of a sequence
+            is its first frame.
+    """
+
+    sequences = sequences or {}
+
+    def _check(resolution):
+        frames = [os.path.join(directory, i)
+                  for i in sequences.get(resolution.filename, ())]
+        return check_file(
+            frames[0] if frames else
+            os.path.join(directory, resolution.filename),
+            resolution, current_id, manifest, frames or None)
+
+    pool = Pool(CONFIG['WORKERS'])
+    try:
+        return pool.map(_check, resolutions)
+    finally:
+        pool.close()
+
+
+def upload(states, resolutions, pipeline, manifest, is_submit=False,
+           submit_note='', sequences=None):
+    """Upload files that waiting for upload, block until finished.
+
+    Args:
+        states (list[FileState]): Check results.
+        resolutions (list[Resolution]): Resolve results of the files.
+        pipeline (str): Pipeline name.
+        manifest (UploadManifest): Upload record.
+        is_submit (bool, optional): Defaults to False. Submit after upload.
+        submit_note (str, optional): Defaults to ''. Submit note.
+        sequences (dict[str, list[str]], optional): Defaults to None.
+            Frame names keyed by sequence name, from `group`.
+
+    Returns:
+        list[dict]: Result for each uploaded file.
+    """
+
+    resolutions = {i.filename: i for i in resolutions}
+    sequences = sequences or {}
+    tasks = []
+    for i in states:
+        if i.status != STATUS_LOCAL:
+            continue
+        name = resolve_name(i.filename)
+        frames = sequences.get(name)
+        if frames and frames[0] == i.filename:
+            directory = os.path.dirname(i.path)
+            tasks.append(UploadTask(
+                '{} ({}帧)'.format(name, len(frames)), i.path, i.dest,
+                is_submit, pipeline, submit_note, resolutions.get(name),
+                [(os.path.join(directory, j), frame_dest(i.dest, j))
+                 for j in frames]))
+        else:
+            tasks.append(UploadTask(
+                i.filename, i.path, i.dest, is_submit, pipeline,
+                submit_note, resolutions.get(i.filename)))
+    ret = []
+    scheduler = UploadScheduler(
+        copy_workers=CONFIG['UPLOAD_COPY_WORKERS'],
+        submit_workers=CONFIG['UPLOAD_SUBMIT_WORKERS'],
+        image_workers=CONFIG['UPLOAD_IMAGE_WORKERS'],
+        manifest=manifest,
+        retries=CONFIG['UPLOAD_RETRIES'],
+        retry_delay=CONFIG['UPLOAD_RETRY_DELAY'],
+        bytes_per_second=CONFIG['UPLOAD_BYTES_PER_SECOND'],
+        is_adaptive=CONFIG['UPLOAD_ADAPTIVE'],
+        on_task_finished=lambda task, error: ret.append({
+            'filename': task.label,
+            'dest': task.dst,
+            'error': l10n(error) if error else None}))
+    scheduler.start(tasks)
+    scheduler.wait()
+    scheduler.close()
+    return ret
+
+
+def _dump(data):
+    json.dump(data, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+
+
+def main(argv=None):
+    """Command line entry.
+
+    Args:
+        argv (list[str], optional): Defaults to None. Use `sys.argv` if None.
+
+    Returns:
+        int: Exit code.
+    """
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    args = _parser().parse_args(argv)
+    directory = os.path.abspath(args.dir)
+    current_id = current_account_id()
+    if current_id is None:
+        _dump({'error': '需要登录CGTeamWork'})
+        return 2
+
+    manifest = UploadManifest()
+    cache = None if args.no_cache else ResolveCache(
+        ttl=CONFIG['CACHE_TTL'], size=CONFIG['CACHE_SIZE'])
+    names, sequences = group(directory)
+    resolutions = resolve(names, args.pipeline, cache)
+    states = check(directory, resolutions, current_id, manifest, sequences)
+    ret = {
+        'command': args.command,
+        'directory': directory,
+        'pipeline': args.pipeline,
+        'files': [dict(i._asdict(), filename=i.filename) for i in states],
+    }
+    if args.command == 'upload':
+        ret['uploads'] = upload(
+            states, resolutions, args.pipeline, manifest, args.submit,
+            args.note, sequences)
+    if args.stats:
+        ret['stats'] = STATS.snapshot()
+    _dump(ret)
+    return 1 if any(i['error'] for i in ret.get('uploads', ())) else 0
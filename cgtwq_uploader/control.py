@@ -4,39 +4,35 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
 import logging
-import mimetypes
 import os
+import threading
+import time
 import webbrowser
-from collections import namedtuple
+from itertools import chain
 from multiprocessing.dummy import Pool
 
-from Qt.QtCore import QCoreApplication, QModelIndex, QObject, Qt, Signal
-from Qt.QtGui import QBrush, QColor
+from Qt.QtCore import QModelIndex, QObject, Qt, QTimer, Signal
 from six.moves import range
+from six.moves.queue import Empty, Queue
 
 import cgtwq
-from cgtwq.helper.qt import ask_login
-from cgtwq.helper.wlf import DatabaseError, get_entry_by_file
-from wlf.env import has_nuke
-from wlf.fileutil import copy, is_same
-from wlf.mimetools import is_mimetype
-from wlf.path import PurePath
-from wlf.progress import CancelledError, progress
-
-from .model import (ROLE_CHECKABLE, ROLE_DEST, DirectoryModel,
-                    VersionFilterProxyModel)
-from .util import LOGGER
-
-LOGGER = logging.getLogger(__name__)
 
+from .cache import ResolveCache
+from .core import (PIPELINE_EXT, PIPELINE_FILETYPES, STATUS_ERROR,
+                   STATUS_LOCAL, STATUS_UPLOADED, Session, check_file,
+                   reject_files)
+from .journal import UploadJournal
+from .manifest import UploadManifest
+from .model import (ROLE_CHECKABLE, ROLE_DEST, ROLE_STATUS, DirectoryModel,
+                    StatusFilterProxyModel, VersionIndex)
+from .resolve import Resolution, resolve_files
+from .scan import scan_files, scan_tree
+from .sequence import frame_dest, group_files, resolve_name, split_frame
+from .stats import STATS
+from .upload import TaskCancelledError, UploadScheduler, UploadTask
+from .util import CONFIG, l10n
 
-class UploadTask(
-    namedtuple('UploadTask',
-               ('label', 'src',
-                'dst', 'is_submit', 'pipeline',
-                'submit_note'))):
-    def __str__(self):
-        return self.label
+LOGGER = logging.getLogger(__name__)
 
 
 class Controller(QObject):
@@ -45,52 +41,113 @@ class Controller(QObject):
     root_changed = Signal(str)
     upload_finished = Signal()
     upload_started = Signal()
+    upload_progress = Signal(int, int, str)
+    upload_failed = Signal(str, str)
+    frame_progress = Signal(str, int, int)
+    _upload_task_finished = Signal(object, object)
+    _results_ready = Signal()
+    _model_updated = Signal(int)
+    _login_required = Signal()
     pipeline = '合成'
+    status_filters = (('全部', None),
+                      ('待上传', (STATUS_LOCAL,)),
+                      ('错误', (STATUS_ERROR,)))
     burnin_folder = 'burn-in'
     default_widget = None
-
-    if has_nuke():
-        brushes = {'local': QBrush(QColor(200, 200, 200)),
-                   'uploaded': QBrush(QColor(100, 100, 100)),
-                   'error': QBrush(Qt.red),
-                   'warning': QBrush(QColor(255, 200, 90))}
-    else:
-        brushes = {'local': QBrush(Qt.black),
-                   'uploaded': QBrush(Qt.gray),
-                   'error': QBrush(Qt.red),
-                   'warning': QBrush(QColor(200, 100, 50))}
-    pipeline_filetypes = {
-        '灯光': 'image',
-        '渲染': 'video',
-        '合成': 'image',
-        '输出': 'video'
-    }
-    pipeline_ext = {
-        '场景细化': ('.ma', '.mb', '.jpg', '.png'),
-        '绘景': ('.psd', '.png', '.tif', '.tga', '.jpg', 'exr'),
-        '监修': ('.psg', '.ma', '.mb', '.jpg', '.png'),
-        '数码作画': ('.tga', '.exr', '.png', '.tif', '.jpg', '.nk'),
-        '手绘特效': ('.jpg', '.png', '.psd', '.mov', '.mp4', '.gif'),
-        '预合成': ('.nk', '.mov', '.mp4')
-    }
+    pipeline_filetypes = PIPELINE_FILETYPES
+    pipeline_ext = PIPELINE_EXT
 
     def __init__(self, parent=None):
         super(Controller, self).__init__(parent)
         model = DirectoryModel(self)
-        proxy_model = VersionFilterProxyModel(self)
+        proxy_model = StatusFilterProxyModel(self)
         proxy_model.setSourceModel(model)
         self.model = proxy_model
         self.is_updating = False
+        self.is_recursive = False
         self.current_id = None
-
-        self.model.layoutChanged.connect(self.update_model)
-        self.upload_finished.connect(self.update_model)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._is_asking_login = False
+        self.session = Session()
+        self.cache = ResolveCache(
+            ttl=CONFIG['CACHE_TTL'], size=CONFIG['CACHE_SIZE'])
+        self.manifest = UploadManifest()
+        self.journal = UploadJournal(
+            pending_seconds=CONFIG['UPLOAD_RESUME_SECONDS'])
+        self.uploader = UploadScheduler(
+            copy_workers=CONFIG['UPLOAD_COPY_WORKERS'],
+            submit_workers=CONFIG['UPLOAD_SUBMIT_WORKERS'],
+            image_workers=CONFIG['UPLOAD_IMAGE_WORKERS'],
+            manifest=self.manifest,
+            on_task_finished=self._upload_task_finished.emit,
+            on_finished=self.upload_finished.emit,
+            on_task_progress=self._on_upload_task_progress,
+            journal=self.journal,
+            retries=CONFIG['UPLOAD_RETRIES'],
+            retry_delay=CONFIG['UPLOAD_RETRY_DELAY'],
+            bytes_per_second=CONFIG['UPLOAD_BYTES_PER_SECOND'],
+            is_adaptive=CONFIG['UPLOAD_ADAPTIVE'])
+        self._upload_done = 0
+        self._upload_total = 0
+        self._upload_task_finished.connect(self._on_upload_task_finished)
+        self.upload_finished.connect(
+            lambda: LOGGER.info('Stats: %s', STATS.dumps()))
+
+        self.root_changed.connect(self.update_model)
+        self._generation = 0
+        self._update_cancel = None
+        self._results = Queue()
+        self._pending_states = {}
+        self._results_ready.connect(self._on_results_ready)
+        self._model_updated.connect(self._on_model_updated)
+        self._login_required.connect(self._on_login_required)
+        model.rowsInserted.connect(self._on_source_rows_inserted)
+
+        # Check results of each pipeline seen in this session.
+        self._states = {}
+
+        # Check results of files in sub directories, keyed by the
+        # folder row under root, only used in recursive mode.
+        self._folders = {}
+        self._tree_paths = (None, None)
+
+        # Frame names keyed by sequence name for each checked directory,
+        # set by workers, so upload needs no scan on GUI thread.
+        self._sequences = {}
+
+        # Incremental update for changed rows.
+        self._stats = {}
+        self._dirty = set()
+        self._inserted = set()
+        self._is_applying = False
+        self._dirty_timer = QTimer(self)
+        self._dirty_timer.setSingleShot(True)
+        self._dirty_timer.setInterval(500)
+        self._dirty_timer.timeout.connect(self.update_dirty)
+        model.dataChanged.connect(self._on_source_data_changed)
+        model.fileRenamed.connect(self._on_source_file_renamed)
 
     def change_pipeline(self, value):
         """Change target pipline.  """
 
         self.pipeline = value
-        self.model.sourceModel().columns[ROLE_DEST].clear()
+        # Results of last pipeline must not be uploaded during refresh,
+        # remembered results of this pipeline are restored on update.
+        self._is_applying = True
+        try:
+            self.model.sourceModel().clear_records()
+        finally:
+            self._is_applying = False
+        self.update_model()
+
+    def change_recursive(self, value):
+        """Change whether files in sub directories are included.  """
+
+        value = bool(value)
+        if value == self.is_recursive:
+            return
+        self.is_recursive = value
         self.update_model()
 
     def change_root(self, value):
@@ -116,7 +173,7 @@ class Controller(QObject):
                 If use the burn-in version.
         """
 
-        data = self.model.data(index)
+        data = self.model.file_name(index)
         filename = self.model.absolute_path(data)
         burn_in_path = self.model.absolute_path(self.burnin_folder, data)
 
@@ -138,201 +195,706 @@ class Controller(QObject):
         source_model = model.sourceModel()
         return model.mapFromSource(source_model.index(path))
 
+    @property
+    def pool(self):
+        """Shared worker pool, created on first use.  """
+
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = Pool(CONFIG['WORKERS'])
+            return self._pool
+
     def _ask_login(self):
+        from cgtwq.helper.qt import ask_login
+
         account_info = ask_login(self.default_widget)
         cgtwq.core.CONFIG['DEFAULT_TOKEN'] = account_info.token
         return account_info
 
+    def reset(self):
+        """Invalidate cached resolutions of current files then update.  """
+
+        names = self.model.all_files()
+        names.extend(i.rpartition('/')[2]
+                     for states in self._folders.values() for i in states)
+        # Sequences are cached by name without frame number.
+        self.cache.invalidate(names + [resolve_name(i) for i in names])
+        self._states.clear()
+        self.update_model()
+
     def update_model(self):
-        """Update directory model.  """
-        if self.is_updating:
-            return
+        """Update directory model in background.
+
+        Files are listed in batches, each batch is resolved and checked
+        then shown right away. In recursive mode all sub directories are
+        listed first, then files of them are resolved in one batch.
+        A running update is cancelled and superseded by the new one.
+        Login is checked in background too, login dialog is shown
+        when needed.
+        """
 
+        if self._update_cancel is not None:
+            self._update_cancel.set()
+        self._generation += 1
+        self._update_cancel = threading.Event()
+        self._pending_states.clear()
+        self._stats.clear()
+        self._dirty.clear()
+        self._inserted.clear()
         self.is_updating = True
+        self._restore_states()
+        thread = threading.Thread(
+            target=self._update_model,
+            args=(self._generation, self._update_cancel,
+                  self.model.sourceModel().rootPath(), self.pipeline,
+                  self.is_recursive))
+        thread.daemon = True
+        thread.start()
+
+    def _restore_states(self):
+        """Show check results seen in this session right away.
+
+        Running update will correct changed ones.
+        """
+
+        model = self.model.sourceModel()
+        root = model.rootPath().rstrip('/')
+        states = self._states.get(self.pipeline, {})
+        items = []
+        for path, state in states.items():
+            if path.rpartition('/')[0] != root:
+                continue
+            index = model.index(path)
+            if index.isValid():
+                items.append((index, state))
+            else:
+                self._pending_states[path] = state
+        self._apply(items)
+
+        folders = set(self._folders)
+        self._folders.clear()
+        if self.is_recursive:
+            self._update_folder_states(states.values())
+        self._update_folders(folders.difference(self._folders))
+
+    def _update_model(self, generation, cancel, root, pipeline,
+                      is_recursive):
+        # pylint: disable=too-many-arguments
+        pool = self.pool
+        groups = []
+        revalidate = []
+        start = time.time()
         try:
-            self._update_model()
+            self.current_id = self.session.account_id()
+            if self.current_id is None:
+                raise cgtwq.LoginError
+            if is_recursive:
+                revalidate = self._update_tree(
+                    generation, cancel, root, pipeline, groups)
+            else:
+                revalidate = self._update_directory(
+                    generation, cancel, root, pipeline, groups)
         except cgtwq.LoginError:
-            self._ask_login()
+            self.session.reset()
+            self._login_required.emit()
+        except:  # pylint: disable=bare-except
+            if not cancel.is_set():
+                LOGGER.error('Update model failed.', exc_info=True)
         finally:
-            self.is_updating = False
+            STATS.add_time('refresh', time.time() - start)
+            LOGGER.info('Stats: %s', STATS.dumps())
+            self._model_updated.emit(generation)
+        if cancel.is_set():
+            return
+        if revalidate:
+            self._revalidate(generation, pipeline, groups, revalidate, pool)
+        names = sorted(set(chain.from_iterable(i[1] for i in groups)))
+        for i in CONFIG['PREFETCH_PIPELINES']:
+            if cancel.is_set():
+                break
+            if i != pipeline:
+                self._prefetch(names, i)
+
+    def _update_directory(self, generation, cancel, root, pipeline, groups):
+        """Update files in root directory batch by batch.
+
+        Returns:
+            list[Resolution]: Resolutions that came from cache
+                and are older than `CACHE_REVALIDATE_SECONDS`.
+        """
+
+        # pylint: disable=too-many-arguments
+        revalidate = []
+        names = []
+        frames = []
+        versions = VersionIndex()
+        for batch in STATS.iterate('refresh.scan', scan_files(root)):
+            if cancel.is_set():
+                return []
+            versions.add(batch)
+            latest = [i for i in batch if versions.is_latest(i)]
+            # Frames are resolved once per sequence after scan.
+            frames.extend(i for i in latest if split_frame(i))
+            latest = [i for i in latest if not split_frame(i)]
+            names.extend(latest)
+            revalidate.extend(self._update_files(
+                generation, pipeline, [(root, latest, None)]))
+        if cancel.is_set():
+            return []
+        group = self._group(
+            root, [i for i in frames if versions.is_latest(i)])
+        revalidate.extend(self._update_files(generation, pipeline, [group]))
+        groups.append((root, [i for i in names if versions.is_latest(i)]
+                       + group[1], group[2]))
+        return revalidate
+
+    def _update_tree(self, generation, cancel, root, pipeline, groups):
+        """Update files in root and all sub directories.
+
+        Returns:
+            list[Resolution]: Resolutions that came from cache
+                and are older than `CACHE_REVALIDATE_SECONDS`.
+        """
+
+        # pylint: disable=too-many-arguments
+        for directory, names in STATS.iterate(
+                'refresh.scan',
+                scan_tree(root, self.pool, (self.burnin_folder,))):
+            if cancel.is_set():
+                return []
+            groups.append(self._group(directory, names))
+        # Replace as a whole, GUI thread may read it for upload.
+        self._sequences = {directory.rstrip('/'): sequences
+                           for directory, _, sequences in groups}
+        ret = self._update_files(generation, pipeline, groups)
+        self._tree_paths = (generation, set(
+            self._state_path(directory, i, sequences)
+            for directory, names, sequences in groups for i in names))
+        return ret
 
-    def _update_model(self):
-        self._update_current_id()
+    @staticmethod
+    def _group(directory, names):
+        """Latest versions in a directory, frames grouped as sequences.
+
+        Returns:
+            tuple[str, list[str], dict[str, list[str]]]: Directory path,
+                file names and frame names keyed by sequence name,
+                a sequence is named without frame number.
+        """
+
+        versions = VersionIndex(names)
+        files, frames = group_files(i for i in names if versions.is_latest(i))
+        sequences = {resolve_name(k): v for k, v in frames.items()}
+        return directory, files + list(sequences), sequences
+
+    @staticmethod
+    def _state_path(directory, name, sequences):
+        """Path of the row that shows check result of name.  """
+
+        frames = (sequences or {}).get(name)
+        return '{}/{}'.format(directory.rstrip('/'),
+                              frames[0] if frames else name)
+
+    def _prefetch(self, filenames, pipeline):
+        """Resolve files for another pipeline into cache.  """
 
-        pool = Pool()
-        count = self.model.rowCount(self.model.root_index())
         try:
-            for _ in progress(
-                    pool.imap_unordered(self._update_model_item, range(count)),
-                    name='访问数据库',
-                    total=count,
-                    parent=self.parent()):
-                pass
-        except CancelledError:
-            LOGGER.info('用户取消')
-
-    def _update_current_id(self):
-        client = cgtwq.DesktopClient()
-        if client.is_logged_in():
-            client.connect()
-
-        if not cgtwq.core.CONFIG['DEFAULT_TOKEN']:
-            current_id = self._ask_login().account_id
-        else:
-            current_id = cgtwq.get_account_id()
+            names, _ = reject_files(filenames, pipeline)
+            cached = self.cache.get_many(names, pipeline)
+            self.cache.put_many(list(resolve_files(
+                [i for i in names if i not in cached], pipeline, self.pool)))
+        except:  # pylint: disable=bare-except
+            LOGGER.warning('Prefetch failed: %s', pipeline, exc_info=True)
 
-        self.current_id = current_id
+    def _update_files(self, generation, pipeline, groups):
+        """Resolve and check files, push results to GUI thread.
 
-    def _update_model_item(self, i):
-        model = self.model
-        root_index = model.root_index()
-        index = model.index(i, 0, root_index)
-        if model.is_dir(index):
-            model.setData(index, False, ROLE_CHECKABLE)
-            model.setData(index, Qt.Unchecked, Qt.CheckStateRole)
+        Files of all groups are resolved in one batch.
+
+        Args:
+            generation (int): Update generation.
+            pipeline (str): Pipeline name.
+            groups (list[tuple[str, list[str], dict[str, list[str]]]]):
+                Directory path, file names in it and frame names keyed
+                by sequence name, a sequence is named without frame number.
+
+        Returns:
+            list[Resolution]: Resolutions that came from cache
+                and are older than `CACHE_REVALIDATE_SECONDS`.
+        """
+
+        pool = self.pool
+        for directory, _, sequences in groups:
+            if sequences:
+                self._sequences.setdefault(
+                    directory.rstrip('/'), {}).update(sequences)
+        names, rejected = reject_files(
+            set(chain.from_iterable(i[1] for i in groups)), pipeline)
+        cached = self.cache.get_many(names, pipeline)
+        STATS.count('refresh.rejected', len(rejected))
+        STATS.count('cache.hit', len(cached))
+        STATS.count('cache.miss', len(names) - len(cached))
+        with STATS.timer('refresh.resolve'):
+            resolved = list(resolve_files(
+                [i for i in names if i not in cached], pipeline, pool))
+        self.cache.put_many(resolved)
+        resolutions = dict(cached)
+        resolutions.update((i.filename, i) for i in resolved)
+        resolutions.update((k, Resolution.failed(k, pipeline, v))
+                           for k, v in rejected.items())
+        self._push_states(generation, self._check_many(groups, resolutions))
+        return [cached[i] for i in self.cache.stale(
+            cached, pipeline, CONFIG['CACHE_REVALIDATE_SECONDS'])]
+
+    def _check_many(self, groups, resolutions):
+        """Check files of groups that has a resolution, called from workers.
+
+        Returns:
+            list[FileState]: Check results.
+        """
+
+        return self.pool.map(
+            lambda i: self._check_item(*i),
+            [(directory, sequences, resolutions[name])
+             for directory, names, sequences in groups
+             for name in names if name in resolutions])
+
+    def update_dirty(self):
+        """Check again only rows that are new, modified or uploaded.  """
+
+        if not self._dirty:
+            return
+        if self.is_updating:
+            # Running full update will check them, or mark them again.
+            self._dirty.clear()
             return
-        data = model.data(index)
-        filename = model.absolute_path(data)
+        model = self.model.sourceModel()
+        root = model.rootPath().rstrip('/')
+        directories = {}
+        for i in self._dirty:
+            directory, _, name = '{}/{}'.format(root, i).rpartition('/')
+            directories.setdefault(directory, []).append(name)
+        self._dirty.clear()
+
+        groups = []
+        for directory, names in directories.items():
+            path = model.filePath(model.index(directory))
+            index = model.version_index(path)
+            sequence_index = model.sequence_index(path)
+            if index is None or sequence_index is None:
+                # Not listed by model, check whole directory.
+                groups.append((directory, None, None))
+                continue
+            files = []
+            sequences = {}
+            for i in names:
+                if not index.is_latest(i):
+                    continue
+                if sequence_index.is_sequence(i):
+                    frames = sequence_index.frames(i)
+                    sequences[resolve_name(frames[0])] = frames
+                else:
+                    files.append(i)
+            groups.append((directory, files + list(sequences), sequences))
+        LOGGER.debug('Update dirty: %s', groups)
+        thread = threading.Thread(
+            target=self._update_dirty,
+            args=(self._generation, self._update_cancel,
+                  self.pipeline, groups))
+        thread.daemon = True
+        thread.start()
+
+    def _update_dirty(self, generation, cancel, pipeline, groups):
+        if cancel is None or cancel.is_set():
+            return
+        try:
+            groups = [
+                self._group(directory, list(chain.from_iterable(
+                    scan_files(directory)))) if names is None
+                else (directory, names, sequences)
+                for directory, names, sequences in groups]
+            self._update_files(generation, pipeline, groups)
+        except cgtwq.LoginError:
+            self.session.reset()
+            self._login_required.emit()
+        except:  # pylint: disable=bare-except
+            LOGGER.error('Update dirty rows failed.', exc_info=True)
+
+    def _mark_dirty(self, filenames):
+        self._dirty.update(filenames)
+        if self._dirty:
+            self._dirty_timer.start()
 
-        def _on_error(reason):
-            model.setData(index, reason, Qt.StatusTipRole)
-            model.setData(index, Qt.Unchecked, Qt.CheckStateRole)
-            model.setData(index,
-                          self.brushes['error'],
-                          Qt.ForegroundRole)
+    def _stat(self, index):
+        model = self.model.sourceModel()
+        return model.size(index), model.lastModified(index).toMSecsSinceEpoch()
+
+    def _is_root(self, parent):
+        model = self.model.sourceModel()
+        return model.filePath(parent) == model.filePath(
+            model.index(model.rootPath()))
+
+    def _on_source_data_changed(self, top_left, bottom_right):
+        if self._is_applying or self.is_updating:
+            return
+        parent = top_left.parent()
+        if not self._is_root(parent):
+            return
+        model = self.model.sourceModel()
+        dirty = []
+        for i in range(top_left.row(), bottom_right.row() + 1):
+            index = model.index(i, 0, parent)
+            path = model.filePath(index)
+            stat = self._stats.get(path)
+            if stat is not None and stat != self._stat(index):
+                dirty.append(model.fileName(index))
+        self._mark_dirty(dirty)
+
+    def _on_source_file_renamed(self, path, old_name, new_name):
+        # pylint: disable=unused-argument
+        if self._is_root(self.model.sourceModel().index(path)):
+            self._mark_dirty([new_name])
+
+    def _revalidate(self, generation, pipeline, groups, resolutions, pool):
+        """Resolve stale cached results again, update changed items.  """
+        # pylint: disable=too-many-arguments
 
         try:
-            try:
-                entry = get_entry_by_file(data, self.pipeline)
-            except DatabaseError:
-                _on_error('找不到对应数据库')
-                return
-            except ValueError as ex:
-                if ex.args[0] == 'Empty selection.':
-                    _on_error('找不到对应任务')
-                    return
-                raise
-            assert isinstance(entry, cgtwq.Entry), type(entry)
-            ext = PurePath(data).suffix.lower()
-
-            # Check extionsion
-            limited_ext = self.pipeline_ext.get(self.pipeline)
-            if limited_ext and not ext in limited_ext:
-                _on_error('此文件扩展名不是 {0}'.format(limited_ext))
-                return
+            old = {i.filename: i for i in resolutions}
+            new = list(resolve_files(old, pipeline, pool))
+            self.cache.put_many(new)
+            changed = {i.filename: i for i in new if i != old.get(i.filename)}
+            if changed:
+                self._push_states(
+                    generation, self._check_many(groups, changed))
+        except:  # pylint: disable=bare-except
+            LOGGER.warning('Revalidate failed.', exc_info=True)
 
-            shot = PurePath(data).shot
-            dest = (model.data(index, ROLE_DEST)
-                    or (PurePath(entry.filebox.get_submit().path) /
-                        PurePath(shot).with_suffix(ext)).as_posix())
-            # Check mimetype
-            limited_filetype = self.pipeline_filetypes.get(self.pipeline)
-            if limited_filetype and not is_mimetype(data, limited_filetype):
-                _on_error('此文件类型不是 {0}'.format(limited_filetype))
-                return
+    def _push_states(self, generation, states):
+        """Queue check results for GUI thread, called from workers.  """
 
-            # Set dest.
-            model.setData(index, dest, ROLE_DEST)
-
-            # Set tooltip.
-            model.setData(index,
-                          '<br>'.join([
-                              '数据库: {0}'.format(
-                                  entry.module.database.name),
-                              '镜头: {0}'.format(shot),
-                              '目的地: {0}'.format(dest)
-                          ]),
-                          Qt.ToolTipRole)
-
-            # Set statustip.
-            is_ok = False
-            is_warning = False
-            is_uploaded = is_same(filename, dest)
-            account_id = entry['account_id']
-            if not account_id:
-                is_ok = True
-                is_warning = True
-                model.setData(
-                    index,
-                    '*注意*: 此任务尚未分配',
-                    Qt.StatusTipRole)
-            elif self.current_id in account_id.split(','):
-                is_ok = True
-                model.setData(
-                    index, '已上传' if is_uploaded else '等待上传', Qt.StatusTipRole)
-            else:
-                assigned = entry['artist']
-                _on_error(
-                    '此任务已分配给:{0}'.format(assigned)
-                    if assigned else '任务未分配'
-                )
-
-            # Set check state.
-            model.setData(index, is_ok, ROLE_CHECKABLE)
-            if not is_ok or is_uploaded:
-                model.setData(index, Qt.Unchecked, Qt.CheckStateRole)
-
-            # Set color.
-            if is_uploaded:
-                model.setData(index,
-                              self.brushes['uploaded'],
-                              Qt.ForegroundRole)
-            elif is_warning:
-                model.setData(index,
-                              self.brushes['warning'],
-                              Qt.ForegroundRole)
-            elif is_ok:
-                model.setData(index,
-                              self.brushes['local'],
-                              Qt.ForegroundRole)
+        self._results.put((generation, [i for i in states if i]))
+        self._results_ready.emit()
+
+    def _on_results_ready(self):
+        states = []
+        while True:
+            try:
+                generation, batch = self._results.get_nowait()
+            except Empty:
+                break
+            if generation == self._generation:
+                states.extend(batch)
+        if not states:
+            return
+
+        model = self.model.sourceModel()
+        root = model.rootPath().rstrip('/')
+        ready = []
+        nested = []
+        for i in states:
+            index = model.index(i.path)
+            if index.isValid():
+                ready.append((index, i))
+            elif i.path.rpartition('/')[0] != root:
+                # Files in sub directories only show in folder rows.
+                nested.append(i)
             else:
-                model.setData(index,
-                              self.brushes['error'],
-                              Qt.ForegroundRole)
+                # Wait for file system model to list it.
+                self._pending_states[i.path] = i
+        self._apply(ready)
+        self._states.setdefault(self.pipeline, {}).update(
+            (i.path, i) for i in nested)
+        self._update_folder_states(nested)
+
+    def _apply(self, items):
+        """Set check results to model rows.
+
+        Args:
+            items (list[tuple[QModelIndex, FileState]]): Row index with
+                check result.
+        """
+
+        model = self.model.sourceModel()
+        states = self._states.setdefault(self.pipeline, {})
+        for index, state in items:
+            self._stats[state.path] = self._stat(index)
+            states[state.path] = state
+        self._is_applying = True
+        try:
+            model.set_many((index, self._state_values(state))
+                           for index, state in items)
+        finally:
+            self._is_applying = False
+        self._update_folder_states(i[1] for i in items)
+
+    def _update_folder_states(self, states):
+        """Count check results of files in sub directories to folder rows.
 
-            return data
+        Args:
+            states (Iterable[FileState]): Check results.
+        """
+
+        if not self.is_recursive:
+            return
+        root = self.model.sourceModel().rootPath().rstrip('/') + '/'
+        folders = set()
+        for i in states:
+            if not i.path.startswith(root):
+                continue
+            name, sep, _ = i.path[len(root):].partition('/')
+            if not sep:
+                continue
+            folder = root + name
+            self._folders.setdefault(folder, {})[i.path] = i
+            folders.add(folder)
+        self._update_folders(folders)
+
+    def _update_folders(self, folders):
+        """Set folder rows from check results of files in them.
+
+        Args:
+            folders (Iterable[str]): Folder paths.
+        """
+
+        model = self.model.sourceModel()
+        items = []
+        for i in folders:
+            index = model.index(i)
+            if index.isValid():
+                items.append((index, self._folder_values(
+                    self._folders.get(i, {}).values())))
+        self._is_applying = True
+        try:
+            model.set_many(items)
+        finally:
+            self._is_applying = False
+
+    @staticmethod
+    def _folder_values(states):
+        """Role values for a folder row.
+
+        Args:
+            states (Iterable[FileState]): Check results of files in folder.
+
+        Returns:
+            dict: Values keyed by role.
+        """
+
+        counts = {STATUS_LOCAL: 0, STATUS_UPLOADED: 0, STATUS_ERROR: 0}
+        for i in states:
+            if i.status in counts:
+                counts[i.status] += 1
+        ret = {
+            ROLE_STATUS: None,
+            ROLE_CHECKABLE: bool(counts[STATUS_LOCAL]),
+            Qt.StatusTipRole: None,
+            Qt.ToolTipRole: None,
+        }
+        if not counts[STATUS_LOCAL]:
+            ret[Qt.CheckStateRole] = Qt.Unchecked
+        if not any(counts.values()):
+            return ret
+        for status in (STATUS_LOCAL, STATUS_UPLOADED, STATUS_ERROR):
+            if counts[status]:
+                ret[ROLE_STATUS] = status
+                break
+        ret[Qt.StatusTipRole] = ret[Qt.ToolTipRole] = (
+            '等待上传: {}, 已上传: {}, 错误: {}'.format(
+                counts[STATUS_LOCAL], counts[STATUS_UPLOADED],
+                counts[STATUS_ERROR]))
+        return ret
+
+    def _on_source_rows_inserted(self, parent, first, last):
+        model = self.model.sourceModel()
+        items = []
+        new = []
+        folders = []
+        for i in range(first, last + 1):
+            index = model.index(i, 0, parent)
+            path = model.filePath(index)
+            state = self._pending_states.pop(path, None)
+            if state:
+                items.append((index, state))
+            elif model.isDir(index):
+                if path in self._folders:
+                    folders.append(path)
+            elif path not in self._stats and self._is_root(parent):
+                new.append(model.fileName(index))
+        self._apply(items)
+        self._update_folders(folders)
+        if self.is_updating:
+            # Full update may already scanned past them.
+            self._inserted.update(new)
+        else:
+            self._mark_dirty(new)
+
+    def _on_model_updated(self, generation):
+        if generation != self._generation:
+            return
+        self.is_updating = False
+        if self._tree_paths[0] == generation:
+            # Forget files removed since last update.
+            paths = self._tree_paths[1]
+            self._tree_paths = (None, None)
+            folders = []
+            for folder, states in self._folders.items():
+                removed = [i for i in states if i not in paths]
+                for i in removed:
+                    del states[i]
+                if removed:
+                    folders.append(folder)
+            self._update_folders(folders)
+        root = self.model.sourceModel().rootPath().rstrip('/')
+        self._mark_dirty(
+            i for i in self._inserted
+            if '{}/{}'.format(root, i) not in self._stats
+            and '{}/{}'.format(root, i) not in self._pending_states)
+        self._inserted.clear()
+
+    def _on_login_required(self):
+        if self._is_asking_login:
+            return
+        self._is_asking_login = True
+        try:
+            self._ask_login()
+        except:  # pylint: disable=bare-except
+            LOGGER.warning('Login cancelled.', exc_info=True)
+            return
+        finally:
+            self._is_asking_login = False
+        self.update_model()
+
+    def close(self):
+        """Stop background work and release pooled threads and connection.  """
+
+        if self._update_cancel is not None:
+            self._update_cancel.set()
+        # Wait running stages, they record into journal.
+        self.uploader.close()
+        self.journal.close()
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+        self.session.close()
+
+    def _check_item(self, directory, sequences, resolution):
+        """Check a file, called from workers.
+
+        Args:
+            directory (str): Directory path of the file.
+            sequences (dict[str, list[str]]): Frame names keyed by
+                sequence name, may be None.
+            resolution (Resolution): Resolve result of the file.
+
+        Returns:
+            FileState: Check result, None when failed unexpectedly.
+        """
+
+        assert isinstance(resolution, Resolution), type(resolution)
+        path = self._state_path(directory, resolution.filename, sequences)
+        frames = (sequences or {}).get(resolution.filename)
+        if frames:
+            frames = ['{}/{}'.format(directory.rstrip('/'), i)
+                      for i in frames]
+        try:
+            with STATS.timer('refresh.check'):
+                return check_file(path, resolution, self.current_id,
+                                  self.manifest, frames)
         except:  # pylint: disable=bare-except
             logging.error(
                 'Unexpected error during access database.', exc_info=True)
-            return '<出错>'
+            return None
+
+    @staticmethod
+    def _state_values(state):
+        """Role values for a check result.
+
+        Args:
+            state (FileState): Check result.
+
+        Returns:
+            dict: Values keyed by role.
+        """
+
+        ret = {
+            ROLE_STATUS: state.status,
+            Qt.StatusTipRole: state.reason,
+            ROLE_CHECKABLE: state.is_checkable,
+        }
+        if not state.is_checkable or state.is_uploaded:
+            ret[Qt.CheckStateRole] = Qt.Unchecked
+        if state.dest:
+            ret[ROLE_DEST] = state.dest
+            ret[Qt.ToolTipRole] = '<br>'.join([
+                '数据库: {0}'.format(state.database),
+                '镜头: {0}'.format(state.shot),
+                '目的地: {0}'.format(state.dest)
+            ])
+        return ret
 
     def upload(self, is_submit=True, submit_note=''):
-        """Upload videos to server.  """
-
-        def _do(i):
-            assert isinstance(i, UploadTask)
-            copy(i.src, i.dst)
-            entry = get_entry_by_file(PurePath(i.src).name, i.pipeline)
-            assert isinstance(entry, cgtwq.Entry)
-
-            message = cgtwq.Message(i.submit_note)
-            # Set image
-            mime, _ = mimetypes.guess_type(i.dst)
-            is_image = mime and mime.startswith('image')
-            if is_image:
-                image = entry.set_image(i.dst)
-                message.images.append(image)
-            # Submit
-            if i.is_submit:
-                entry.flow.submit([i.dst], message=message)
-            return i.label
-
-        pool = Pool()
+        """Start uploading checked files to server, returns immediately.  """
+
         tasks = self.tasks(is_submit, submit_note)
+        self._upload_done = 0
+        self._upload_total = len(tasks)
         self.upload_started.emit()
-        try:
-            for i in progress(
-                    tasks,
-                    name='上传',
-                    parent=self.parent()):
-                result = pool.apply_async(_do, (i,))
-                while not result.ready():
-                    QCoreApplication.processEvents()
-                if not result.successful():
-                    break
-        except CancelledError:
-            LOGGER.info('用户取消')
-        self.upload_finished.emit()
+        self.uploader.start(tasks)
+
+    def pending_upload_count(self):
+        """Count of tasks left by last closed or crashed uploader.  """
+
+        return len(self.journal.pending())
+
+    def discard_pending_upload(self):
+        """Give up tasks left by last uploader, they will not resume.  """
+
+        self.journal.cancel_pending()
+
+    def resume_upload(self):
+        """Resume tasks left by last closed or crashed uploader.
+
+        Returns:
+            bool: Whether any task resumed.
+        """
+
+        # Finish signals are queued, so counters reset in time.
+        count = self.uploader.resume()
+        if not count:
+            return False
+        self._upload_done = 0
+        self._upload_total = count
+        self.upload_started.emit()
+        return True
+
+    def cancel_upload(self):
+        """Cancel tasks that not started yet.  """
+
+        LOGGER.info('用户取消')
+        self.uploader.cancel()
+
+    def _on_upload_task_progress(self, task, done, total):
+        # Called from workers, only report every few frames.
+        if done % 20 == 0 or done == total:
+            self.frame_progress.emit(task.label, done, total)
+
+    def _on_upload_task_finished(self, task, error):
+        root = self.model.sourceModel().rootPath().rstrip('/') + '/'
+        src = task.src.replace('\\', '/')
+        if src.startswith(root):
+            self._mark_dirty([src[len(root):]])
+        self._upload_done += 1
+        self.upload_progress.emit(
+            self._upload_done, self._upload_total, task.label)
+        if error is None:
+            STATS.count('upload.succeed')
+        elif isinstance(error, TaskCancelledError):
+            STATS.count('upload.cancelled')
+        else:
+            STATS.count('upload.failed')
+            self.upload_failed.emit(task.label, l10n(error))
 
     def tasks(self, is_submit=True, submit_note=''):
         """Get task list from model.
@@ -346,40 +908,108 @@ class Controller(QObject):
         model = self.model
         root_index = model.root_index()
         count = model.rowCount(root_index)
+        source_model = model.sourceModel()
+        root = source_model.rootPath().rstrip('/')
+        sequences = source_model.sequence_index(source_model.filePath(
+            source_model.index(source_model.rootPath())))
 
-        ret = []
+        # Label, source, destination, resolve name and frames of tasks.
+        items = []
         for i in range(count):
             index = model.index(i, 0, root_index)
-            if model.data(index, Qt.CheckStateRole):
-                label = model.data(index, Qt.DisplayRole)
-                src = model.file_path(index)
-                dst = model.data(index, ROLE_DEST)
-                task = UploadTask(label, src, dst, is_submit,
-                                  self.pipeline, submit_note)
-                ret.append(task)
+            if not model.data(index, Qt.CheckStateRole):
+                continue
+            if model.is_dir(index):
+                items.extend(self._folder_items(model.file_path(index)))
+                continue
+            name = model.file_name(index)
+            dst = model.data(index, ROLE_DEST)
+            if not dst:
+                # Not checked with current pipeline yet.
+                continue
+            frames = None
+            if sequences is not None and sequences.is_sequence(name):
+                frames = [('{}/{}'.format(root, j), frame_dest(dst, j))
+                          for j in sequences.frames(name)]
+                name = resolve_name(name)
+            items.append((model.data(index, Qt.DisplayRole),
+                          model.file_path(index), dst, name, frames))
+        # Carry resolved entries, so upload does not query them again.
+        resolutions = self.cache.get_many(
+            list(set(i[3] for i in items)), self.pipeline)
+
+        return [UploadTask(label, src, dst, is_submit, self.pipeline,
+                           submit_note, resolutions.get(name), frames)
+                for label, src, dst, name, frames in items]
+
+    def _folder_items(self, folder):
+        """Task items for files waiting for upload in a folder.
+
+        Args:
+            folder (str): Folder path.
+
+        Returns:
+            list[tuple]: Label, source, destination, resolve name
+                and frames of each task.
+        """
+
+        root = self.model.sourceModel().rootPath().rstrip('/')
+        ret = []
+        for state in sorted(self._folders.get(folder, {}).values()):
+            if state.status != STATUS_LOCAL:
+                continue
+            directory, _, name = state.path.rpartition('/')
+            label = state.path[len(root) + 1:]
+            frames = self._sequences.get(directory, {}).get(
+                resolve_name(name))
+            if frames and frames[0] == name:
+                label = '{} ({}帧)'.format(label, len(frames))
+                name = resolve_name(name)
+                frames = [('{}/{}'.format(directory, i),
+                           frame_dest(state.dest, i)) for i in frames]
+            else:
+                frames = None
+            ret.append((label, state.path, state.dest, name, frames))
         return ret
 
+    def _set_checked(self, checked):
+        """Check rows and uncheck other checked rows, costs O(changed).
+
+        Args:
+            checked (list[QModelIndex]): Source model indexes to check.
+        """
+
+        model = self.model.sourceModel()
+        keys = set(i.internalId() for i in checked)
+        items = [(i, {Qt.CheckStateRole: Qt.Checked}) for i in checked
+                 if model.data(i, Qt.CheckStateRole) != Qt.Checked]
+        items.extend((i, {Qt.CheckStateRole: Qt.Unchecked})
+                     for i in self.model.checked_rows()
+                     if i.internalId() not in keys)
+        self._is_applying = True
+        try:
+            model.set_many(items)
+        finally:
+            self._is_applying = False
+
     def reverse_selection(self):
         """Reverse current selection.  """
 
-        model = self.model
-        for i in model.indexes():
-            state = model.data(i, Qt.CheckStateRole)
-            if model.data(i, Qt.ForegroundRole) == self.brushes['local']:
-                model.setData(i, Qt.Unchecked
-                              if state else Qt.Checked,
-                              Qt.CheckStateRole)
-            else:
-                model.setData(i, Qt.Unchecked,
-                              Qt.CheckStateRole)
+        model = self.model.sourceModel()
+        self._set_checked([
+            i for i in self.model.status_rows(STATUS_LOCAL)
+            if model.data(i, Qt.CheckStateRole) != Qt.Checked])
 
     def select_all(self):
         """Select all local item.  """
 
-        model = self.model
-        for i in model.indexes():
-            if model.data(i, Qt.ForegroundRole) == self.brushes['local']:
-                model.setData(i, Qt.Checked, Qt.CheckStateRole)
-            else:
-                model.setData(i, Qt.Unchecked,
-                              Qt.CheckStateRole)
+        self._set_checked(self.model.status_rows(STATUS_LOCAL))
+
+    def change_status_filter(self, statuses):
+        """Show only rows of these statuses.
+
+        Args:
+            statuses (Iterable[str]): Row statuses, None to show all.
+        """
+
+        self.model.set_statuses(statuses)
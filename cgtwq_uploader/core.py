@@ -0,0 +1,277 @@
+# -*- coding=UTF-8 -*-
+"""Qt-free checks shared by dialog and command line.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import mimetypes
+import os
+import threading
+from collections import namedtuple
+
+import cgtwq
+from wlf.fileutil import version_filter
+from wlf.mimetools import is_mimetype
+from wlf.path import PurePath
+
+from . import sequence
+
+STATUS_LOCAL = 'local'
+STATUS_UPLOADED = 'uploaded'
+STATUS_ERROR = 'error'
+STATUS_WARNING = 'warning'
+
+PIPELINE_FILETYPES = {
+    '灯光': 'image',
+    '渲染': 'video',
+    '合成': 'image',
+    '输出': 'video'
+}
+PIPELINE_EXT = {
+    '场景细化': ('.ma', '.mb', '.jpg', '.png'),
+    '绘景': ('.psd', '.png', '.tif', '.tga', '.jpg', 'exr'),
+    '监修': ('.psg', '.ma', '.mb', '.jpg', '.png'),
+    '数码作画': ('.tga', '.exr', '.png', '.tif', '.jpg', '.nk'),
+    '手绘特效': ('.jpg', '.png', '.psd', '.mov', '.mp4', '.gif'),
+    '预合成': ('.nk', '.mov', '.mp4')
+}
+
+
+_MIMETYPES = {}
+_CLASSIFIERS = {}
+
+
+def guess_type(filename):
+    """Memoized `mimetypes.guess_type` by file extension.
+
+    Args:
+        filename (str): File name or path.
+
+    Returns:
+        str: Mimetype, None if unknown.
+    """
+
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        return _MIMETYPES[ext]
+    except KeyError:
+        ret = _MIMETYPES[ext] = mimetypes.guess_type('file' + ext)[0]
+        return ret
+
+
+class Classifier(object):
+    """File extension table for a pipeline.
+
+    Each extension is checked against pipeline limits once,
+    so files can be rejected locally before any database query.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.limited_ext = PIPELINE_EXT.get(pipeline)
+        self.limited_filetype = PIPELINE_FILETYPES.get(pipeline)
+        self._table = {}
+
+    def reason(self, filename):
+        """Reject reason for a file.
+
+        Args:
+            filename (str): File name.
+
+        Returns:
+            str: Reason, None if file type is allowed.
+        """
+
+        ext = PurePath(filename).suffix.lower()
+        try:
+            return self._table[ext]
+        except KeyError:
+            ret = self._table[ext] = self._reason(ext)
+            return ret
+
+    def _reason(self, ext):
+        if self.limited_ext and not ext in self.limited_ext:
+            return '此文件扩展名不是 {0}'.format(self.limited_ext)
+        if (self.limited_filetype
+                and not is_mimetype('file' + ext, self.limited_filetype)):
+            return '此文件类型不是 {0}'.format(self.limited_filetype)
+        return None
+
+
+def classifier(pipeline):
+    """Shared classifier for pipeline.
+
+    Args:
+        pipeline (str): Pipeline name.
+
+    Returns:
+        Classifier: Classifier for the pipeline.
+    """
+
+    try:
+        return _CLASSIFIERS[pipeline]
+    except KeyError:
+        ret = _CLASSIFIERS[pipeline] = Classifier(pipeline)
+        return ret
+
+
+def reject_files(filenames, pipeline):
+    """Split files that can be rejected without database query.
+
+    Args:
+        filenames (Iterable[str]): File names.
+        pipeline (str): Pipeline name.
+
+    Returns:
+        tuple[list[str], dict[str, str]]:
+            Accepted file names and reject reason for rejected ones.
+    """
+
+    table = classifier(pipeline)
+    accepted, rejected = [], {}
+    for i in filenames:
+        reason = table.reason(i)
+        if reason:
+            rejected[i] = reason
+        else:
+            accepted.append(i)
+    return accepted, rejected
+
+
+class FileState(
+        namedtuple('FileState',
+                   ('path', 'status', 'reason', 'dest', 'database', 'shot',
+                    'is_uploaded', 'is_checkable'))):
+    """Check result of a file.  """
+
+    @property
+    def filename(self):
+        """File base name.  """
+
+        return os.path.basename(self.path)
+
+
+def current_account_id():
+    """Account id of current CGTeamWork user.
+
+    Returns:
+        str: Account id, None if not logged in.
+    """
+
+    return Session().account_id()
+
+
+class Session(object):
+    """Kept-alive CGTeamWork desktop client connection.
+
+    Client is connected once, account id is only queried again
+    when token changed.
+    """
+
+    def __init__(self):
+        self.client = None
+        self._lock = threading.Lock()
+        self._token = None
+        self._account_id = None
+
+    def account_id(self):
+        """Account id of current CGTeamWork user.
+
+        Returns:
+            str: Account id, None if not logged in.
+        """
+
+        with self._lock:
+            if not cgtwq.core.CONFIG['DEFAULT_TOKEN']:
+                if self.client is None:
+                    self.client = cgtwq.DesktopClient()
+                if self.client.is_logged_in():
+                    self.client.connect()
+            token = cgtwq.core.CONFIG['DEFAULT_TOKEN']
+            if not token:
+                return None
+            if token != self._token:
+                self._account_id = cgtwq.get_account_id()
+                self._token = token
+            return self._account_id
+
+    def reset(self):
+        """Query account id again on next use.  """
+
+        with self._lock:
+            self._token = None
+            self._account_id = None
+
+    def close(self):
+        """Release client.  """
+
+        self.reset()
+        self.client = None
+
+
+def list_files(directory):
+    """Latest version of files in a directory.
+
+    Args:
+        directory (str): Directory path.
+
+    Returns:
+        list[str]: File names.
+    """
+
+    return version_filter(
+        i for i in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, i)))
+
+
+def check_file(path, resolution, current_id, manifest, frames=None):
+    """Check whether a file can be uploaded.
+
+    Args:
+        path (str): File path, first frame path for a sequence.
+        resolution (Resolution): Resolve result of the file.
+        current_id (str): Current account id.
+        manifest (UploadManifest): Upload record.
+        frames (list[str], optional): Defaults to None.
+            Frame paths when checking a image sequence.
+
+    Returns:
+        FileState: Check result.
+    """
+
+    def _error(reason):
+        return FileState(path, STATUS_ERROR, reason, None, None, None,
+                         False, False)
+
+    filename = resolution.filename
+    reason = classifier(resolution.pipeline).reason(filename)
+    if reason:
+        return _error(reason)
+    if resolution.error:
+        return _error(resolution.error)
+
+    if frames:
+        dest = resolution.sequence_dest()
+        is_uploaded = sequence.is_uploaded(frames, dest)
+    else:
+        dest = resolution.dest()
+        is_uploaded = manifest.is_uploaded(path, dest)
+    account_id = resolution.account_id
+    if not account_id:
+        is_ok = True
+        status = STATUS_WARNING
+        reason = '*注意*: 此任务尚未分配'
+    elif current_id in account_id.split(','):
+        is_ok = True
+        status = STATUS_LOCAL
+        reason = '已上传' if is_uploaded else '等待上传'
+    else:
+        is_ok = False
+        status = STATUS_ERROR
+        assigned = resolution.artist
+        reason = ('此任务已分配给:{0}'.format(assigned)
+                  if assigned else '任务未分配')
+    if is_uploaded:
+        status = STATUS_UPLOADED
+    return FileState(path, status, reason, dest, resolution.database,
+                     PurePath(filename).shot, is_uploaded, is_ok)
@@ -0,0 +1,190 @@
+# -*- coding=UTF-8 -*-
+"""Durable record of upload tasks, for resume after restart.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .resolve import Resolution
+
+STAGE_COPY = 'copy'
+STAGE_IMAGE = 'image'
+STAGE_SUBMIT = 'submit'
+STAGE_DONE = 'done'
+STAGE_FAILED = 'failed'
+STAGE_CANCELLED = 'cancelled'
+PENDING_STAGES = (STAGE_COPY, STAGE_IMAGE, STAGE_SUBMIT)
+
+# Finished records are kept this long for troubleshooting.
+KEEP_SECONDS = 7 * 24 * 60 * 60
+
+
+def _dumps(task):
+    return json.dumps({
+        'label': task.label,
+        'src': task.src,
+        'dst': task.dst,
+        'is_submit': bool(task.is_submit),
+        'pipeline': task.pipeline,
+        'submit_note': task.submit_note,
+        'resolution': list(task.resolution) if task.resolution else None,
+        'frames': task.frames,
+        'priority': task.priority,
+    })
+
+
+def _loads(data):
+    data = json.loads(data)
+    if data['resolution']:
+        data['resolution'] = Resolution(*data['resolution'])
+    if data['frames']:
+        data['frames'] = [tuple(i) for i in data['frames']]
+    return data
+
+
+class UploadJournal(object):
+    """Stage of each upload task saved in sqlite.
+
+    A task is recorded before it starts, then its stage moves forward
+    through copy, image and submit. Tasks still in these stages when
+    uploader exits are pending, they resume from recorded stage.
+
+    Args:
+        path (str, optional): Defaults to None. Database path.
+        keep_seconds (float, optional): Defaults to KEEP_SECONDS.
+            Finished records older than this are removed.
+        pending_seconds (float, optional): Defaults to None. Pending
+            records not updated for this long are cancelled,
+            never when None.
+    """
+
+    path = os.path.expanduser('~/.wlf.uploader.journal.db')
+
+    def __init__(self, path=None, keep_seconds=KEEP_SECONDS,
+                 pending_seconds=None):
+        self.path = path or self.path
+        self._lock = threading.Lock()
+        self._conn = None
+        with self._lock, self._connect():
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS task ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT, '
+                'stage TEXT, attempts INTEGER, error TEXT, '
+                'created REAL, updated REAL)')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS task_stage ON task (stage)')
+            self._conn.execute(
+                'DELETE FROM task WHERE updated < ? AND stage NOT IN '
+                '(?, ?, ?)', (time.time() - keep_seconds,) + PENDING_STAGES)
+        if pending_seconds is not None:
+            self.cancel_pending(time.time() - pending_seconds, '已过期')
+
+    def _connect(self):
+        """Open database connection if closed, call with lock held.  """
+
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                self.path, check_same_thread=False)
+        return self._conn
+
+    def add_many(self, tasks):
+        """Record new tasks at copy stage.
+
+        Args:
+            tasks (Iterable[UploadTask]): Tasks to record.
+
+        Returns:
+            list[int]: Record id for each task.
+        """
+
+        now = time.time()
+        ret = []
+        with self._lock, self._connect():
+            for i in tasks:
+                ret.append(self._conn.execute(
+                    'INSERT INTO task (data, stage, attempts, created, '
+                    'updated) VALUES (?, ?, 0, ?, ?)',
+                    (_dumps(i), STAGE_COPY, now, now)).lastrowid)
+        return ret
+
+    def set_stage(self, task_id, stage, error=None):
+        """Move task to a stage, attempts restart from zero.
+
+        Args:
+            task_id (int): Record id.
+            stage (str): Stage name.
+            error (str, optional): Defaults to None. Error message.
+        """
+
+        with self._lock, self._connect():
+            self._conn.execute(
+                'UPDATE task SET stage = ?, attempts = 0, error = ?, '
+                'updated = ? WHERE id = ?',
+                (stage, error, time.time(), task_id))
+
+    def add_attempt(self, task_id, error):
+        """Record a failed attempt of current stage.
+
+        Args:
+            task_id (int): Record id.
+            error (str): Error message.
+
+        Returns:
+            int: Failed attempts of current stage.
+        """
+
+        with self._lock, self._connect():
+            self._conn.execute(
+                'UPDATE task SET attempts = attempts + 1, error = ?, '
+                'updated = ? WHERE id = ?', (error, time.time(), task_id))
+            row = self._conn.execute(
+                'SELECT attempts FROM task WHERE id = ?',
+                (task_id,)).fetchone()
+        return row[0] if row else 0
+
+    def pending(self):
+        """Tasks not finished, failed or cancelled.
+
+        Returns:
+            list[tuple[int, str, dict]]: Record id, stage and
+                `UploadTask` fields of each task, oldest first.
+        """
+
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT id, stage, data FROM task WHERE stage IN (?, ?, ?) '
+                'ORDER BY id', PENDING_STAGES).fetchall()
+        return [(i, stage, _loads(data)) for i, stage, data in rows]
+
+    def cancel_pending(self, before=None, error='已放弃'):
+        """Cancel pending tasks, so they are not resumed.
+
+        Args:
+            before (float, optional): Defaults to None. Only cancel tasks
+                not updated since this timestamp, all when None.
+            error (str, optional): Defaults to '已放弃'. Reason to record.
+
+        Returns:
+            int: Cancelled task count.
+        """
+
+        before = time.time() if before is None else before
+        with self._lock, self._connect():
+            return self._conn.execute(
+                'UPDATE task SET stage = ?, error = ?, updated = ? '
+                'WHERE updated <= ? AND stage IN (?, ?, ?)',
+                (STAGE_CANCELLED, error, time.time(), before)
+                + PENDING_STAGES).rowcount
+
+    def close(self):
+        """Close database connection, it is opened again on next use.  """
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,153 @@
+# -*- coding=UTF-8 -*-
+"""Local record of uploaded files.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from wlf.fileutil import is_same
+
+from .stats import STATS
+
+SAMPLE_SIZE = 1024 * 1024
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def sample_hash(path, sample_size=SAMPLE_SIZE):
+    """Fast content hash from head, middle and tail of file.
+
+    Args:
+        path (str): File path.
+        sample_size (int, optional): Defaults to SAMPLE_SIZE.
+            Bytes to read for each sample.
+
+    Returns:
+        str: Hex digest.
+    """
+
+    try:
+        ret = hashlib.blake2b(digest_size=16)
+    except AttributeError:
+        ret = hashlib.sha1()
+    size = os.path.getsize(path)
+    ret.update(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        for offset in sorted(set(
+                (0, max(0, size // 2 - sample_size // 2),
+                 max(0, size - sample_size)))):
+            f.seek(offset)
+            ret.update(f.read(sample_size))
+    return ret.hexdigest()
+
+
+class UploadManifest(object):
+    """Record of uploaded files, avoid comparing content with server.
+
+    Each record saves source stat and hash with destination stat
+    right after upload. A file is uploaded when both stats still match,
+    source hash is only computed when its stat changed.
+    """
+
+    path = os.path.expanduser('~/.wlf.uploader.manifest.db')
+
+    def __init__(self, path=None):
+        self.path = path or self.path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS upload ('
+                'src TEXT, dst TEXT, src_size INTEGER, src_mtime REAL, '
+                'src_hash TEXT, dst_size INTEGER, dst_mtime REAL, '
+                'updated REAL, PRIMARY KEY (src, dst))')
+
+    def _get(self, src, dst):
+        src, dst = _key(src), _key(dst)
+        with self._lock:
+            return self._conn.execute(
+                'SELECT src_size, src_mtime, src_hash, dst_size, dst_mtime '
+                'FROM upload WHERE src = ? AND dst = ?',
+                (src, dst)).fetchone()
+
+    def record(self, src, dst, src_hash=None):
+        """Record a uploaded file.
+
+        Args:
+            src (str): Local file path.
+            dst (str): Server file path.
+            src_hash (str, optional): Defaults to None.
+                Hash of `src`, computed when not given.
+        """
+
+        src_stat, dst_stat = _stat(src), _stat(dst)
+        if src_stat is None or dst_stat is None:
+            return
+        src_hash = src_hash or sample_hash(src)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO upload VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?)',
+                (_key(src), _key(dst)) + src_stat + (src_hash,) + dst_stat +
+                (time.time(),))
+
+    def remove(self, src, dst):
+        """Remove record.  """
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM upload WHERE src = ? AND dst = ?',
+                (_key(src), _key(dst)))
+
+    def is_uploaded(self, src, dst):
+        """Whether src is already uploaded to dst.
+
+        Costs one local stat and one server stat when recorded,
+        fallback to full compare when stat not match.
+
+        Args:
+            src (str): Local file path.
+            dst (str): Server file path.
+
+        Returns:
+            bool: True if uploaded.
+        """
+
+        row = self._get(src, dst)
+        if row is not None:
+            src_size, src_mtime, src_hash, dst_size, dst_mtime = row
+            src_stat = _stat(src)
+            dst_stat = _stat(dst)
+            if dst_stat == (dst_size, dst_mtime):
+                if src_stat == (src_size, src_mtime):
+                    STATS.count('manifest.stat_hit')
+                    return True
+                if (src_stat is not None and src_stat[0] == src_size
+                        and sample_hash(src) == src_hash):
+                    STATS.count('manifest.hash_hit')
+                    self.record(src, dst, src_hash)
+                    return True
+
+        STATS.count('manifest.miss')
+        with STATS.timer('check.is_same'):
+            ret = is_same(src, dst)
+        if ret:
+            self.record(src, dst)
+        elif row is not None:
+            self.remove(src, dst)
+        return ret
@@ -6,46 +6,209 @@ from __future__ import (absolute_import, division, print_function,
 
 import os
 
-from Qt.QtCore import QDir, QPersistentModelIndex, QSortFilterProxyModel, Qt
+from Qt.QtCore import (QDir, QPersistentModelIndex, QSortFilterProxyModel, Qt,
+                       Signal)
+from Qt.QtGui import QBrush, QColor
 from Qt.QtWidgets import QFileSystemModel
 from six.moves import range
 
+from wlf.env import has_nuke
 from wlf.fileutil import version_filter
+from wlf.path import PurePath
+
+from .core import STATUS_ERROR, STATUS_LOCAL, STATUS_UPLOADED, STATUS_WARNING
+from .sequence import SequenceIndex
 
 ROLE_DEST = Qt.UserRole + 1
 ROLE_CHECKABLE = Qt.UserRole + 2
+ROLE_STATUS = Qt.UserRole + 3
+
+if has_nuke():
+    BRUSHES = {STATUS_LOCAL: QBrush(QColor(200, 200, 200)),
+               STATUS_UPLOADED: QBrush(QColor(100, 100, 100)),
+               STATUS_ERROR: QBrush(Qt.red),
+               STATUS_WARNING: QBrush(QColor(255, 200, 90))}
+else:
+    BRUSHES = {STATUS_LOCAL: QBrush(Qt.black),
+               STATUS_UPLOADED: QBrush(Qt.gray),
+               STATUS_ERROR: QBrush(Qt.red),
+               STATUS_WARNING: QBrush(QColor(200, 100, 50))}
+
+
+class VersionIndex(object):
+    """Latest version lookup for file names in one directory.
+
+    Names are grouped by shot, so adding or removing a name only
+    re-filters the versions of that shot.
+    """
+
+    def __init__(self, names=()):
+        self._keys = {}
+        self._groups = {}
+        self._latest = {}
+        self.add(names)
+
+    def __contains__(self, name):
+        return name in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _key(name):
+        return PurePath(name).shot.lower()
+
+    def is_latest(self, name):
+        """Whether name is the latest version of its shot.
+
+        Args:
+            name (str): File name.
+
+        Returns:
+            bool: True if name is latest, or not indexed.
+        """
+
+        key = self._keys.get(name)
+        return key is None or name in self._latest[key]
+
+    def add(self, names):
+        """Add names to index.
+
+        Args:
+            names (Iterable[str]): File names.
+
+        Returns:
+            set[str]: Previously indexed names whose latest state changed.
+        """
+
+        names = set(i for i in names if i not in self._keys)
+        for name in names:
+            key = self._key(name)
+            self._keys[name] = key
+            self._groups.setdefault(key, set()).add(name)
+        return self._update(set(self._keys[i] for i in names)) - names
+
+    def remove(self, names):
+        """Remove names from index.
+
+        Args:
+            names (Iterable[str]): File names.
+
+        Returns:
+            set[str]: Remaining names whose latest state changed.
+        """
+
+        names = set(i for i in names if i in self._keys)
+        keys = set()
+        for name in names:
+            key = self._keys.pop(name)
+            self._groups[key].discard(name)
+            keys.add(key)
+        return self._update(keys) - names
+
+    def _update(self, keys):
+        changed = set()
+        for key in keys:
+            old = self._latest.pop(key, set())
+            group = self._groups.get(key)
+            if group:
+                new = set(version_filter(group))
+                self._latest[key] = new
+            else:
+                new = set()
+                self._groups.pop(key, None)
+            changed |= old ^ new
+        return changed
+
+
+class RowRecord(object):
+    """Extra data of a row.  """
+
+    __slots__ = ('check_state', 'checkable', 'status', 'status_tip',
+                 'tooltip', 'dest')
+
+    def __init__(self):
+        self.check_state = Qt.Unchecked
+        self.checkable = None
+        self.status = None
+        self.status_tip = None
+        self.tooltip = None
+        self.dest = None
 
 
 class DirectoryModel(QFileSystemModel):
-    """Checkable fileSystem model.  """
+    """Checkable fileSystem model.
+
+    Extra row data is saved in `records` keyed by index internal id,
+    which is stable until the file is removed.
+    Checked rows and rows of each status are indexed as rows change.
+    First frame of a image sequence is displayed as the sequence.
+    """
+
+    versions_changed = Signal(str)
+    roles = {
+        Qt.CheckStateRole: 'check_state',
+        Qt.ToolTipRole: 'tooltip',
+        Qt.StatusTipRole: 'status_tip',
+        ROLE_STATUS: 'status',
+        ROLE_DEST: 'dest',
+        ROLE_CHECKABLE: 'checkable',
+    }
 
     def __init__(self, parent=None):
-        
+
         super(DirectoryModel, self).__init__(parent)
         self.setFilter(QDir.NoDot | QDir.Files | QDir.Dirs)
-        self.columns = {
-            Qt.CheckStateRole: {},
-            Qt.ToolTipRole: {},
-            Qt.StatusTipRole: {},
-            Qt.ForegroundRole: {},
-            ROLE_DEST: {},
-            ROLE_CHECKABLE: {}
-        }
+        self.records = {}
+        self.checked = {}
+        self.statuses = {}
+        self.version_indexes = {}
+        self.sequence_indexes = {}
+
+        self.directoryLoaded.connect(self._on_directory_loaded)
+        self.rowsInserted.connect(self._on_rows_inserted)
+        self.rowsAboutToBeRemoved.connect(self._on_rows_about_to_be_removed)
+        self.fileRenamed.connect(self._on_file_renamed)
+
+    def fileName(self, index):
+        """Override, file name instead of display label.
+
+        Base implementation reads `data` with display role,
+        which is sequence label for sequence heads.
+        """
+        # pylint: disable=invalid-name
+
+        return super(DirectoryModel, self).data(index, Qt.DisplayRole)
 
     def data(self, index, role=Qt.DisplayRole):
         """Override.  """
 
-        pindex = QPersistentModelIndex(index)
-        if role in self.columns:
-            default = {Qt.CheckStateRole: Qt.Unchecked}.get(role)
-            return self.columns[role].get(pindex, default)
+        if role == Qt.DisplayRole:
+            sequences = self.sequence_indexes.get(
+                self.filePath(index.parent()))
+            if sequences is not None:
+                name = super(DirectoryModel, self).data(index, role)
+                label = sequences.label(name)
+                if label is not None:
+                    return label
+                return name
+        elif role == Qt.ForegroundRole:
+            record = self.records.get(index.internalId())
+            return BRUSHES.get(record.status) if record else None
+        attr = self.roles.get(role)
+        if attr is not None:
+            record = self.records.get(index.internalId())
+            if record is None:
+                return Qt.Unchecked if role == Qt.CheckStateRole else None
+            return getattr(record, attr)
         return super(DirectoryModel, self).data(index, role)
 
     def flags(self, index):
         """Override.  """
 
         ret = super(DirectoryModel, self).flags(index)
-        if self.data(index, ROLE_CHECKABLE):
+        record = self.records.get(index.internalId())
+        if record and record.checkable:
             ret |= Qt.ItemIsUserCheckable
         return ret
 
@@ -53,23 +216,177 @@ class DirectoryModel(QFileSystemModel):
         """Override.  """
         # pylint: disable=invalid-name
 
-        pindex = QPersistentModelIndex(index)
-        if role in self.columns:
-            self.columns[role][pindex] = value
+        if role in self.roles:
+            self._set(index, role, value)
             self.dataChanged.emit(index, index)
             return True
         return super(DirectoryModel, self).setData(index, value, role)
 
+    def _set(self, index, role, value):
+        key = index.internalId()
+        record = self.records.get(key)
+        if record is None:
+            record = self.records[key] = RowRecord()
+        if role == ROLE_STATUS and record.status != value:
+            self.statuses.get(record.status, {}).pop(key, None)
+            if value is not None:
+                self.statuses.setdefault(value, {})[key] = (
+                    QPersistentModelIndex(index))
+        setattr(record, self.roles[role], value)
+        if role == Qt.CheckStateRole:
+            if value == Qt.Checked:
+                self.checked[key] = QPersistentModelIndex(index)
+            else:
+                self.checked.pop(key, None)
+
+    def clear(self, role):
+        """Clear value of role for all rows.  """
+
+        attr = self.roles[role]
+        default = RowRecord()
+        for i in self.records.values():
+            setattr(i, attr, getattr(default, attr))
+        if role == Qt.CheckStateRole:
+            self.checked.clear()
+        elif role == ROLE_STATUS:
+            self.statuses.clear()
+
+    def clear_records(self):
+        """Clear extra data of all rows, e.g. results of another pipeline.  """
+
+        self.records.clear()
+        self.checked.clear()
+        self.statuses.clear()
+        root_index = self.index(self.rootPath())
+        count = self.rowCount(root_index)
+        if count:
+            self.dataChanged.emit(self.index(0, 0, root_index),
+                                  self.index(count - 1, 0, root_index))
+
+    def set_many(self, items):
+        """Set role values for many rows, emit one `dataChanged` per parent.
+
+        Args:
+            items (Iterable[tuple[QModelIndex, dict]]):
+                Row index with values keyed by role.
+        """
+
+        rows = {}
+        for index, values in items:
+            if not values:
+                continue
+            for role, value in values.items():
+                self._set(index, role, value)
+            rows.setdefault(self.filePath(index.parent()),
+                            []).append(index.row())
+        for path, i in rows.items():
+            parent = self.index(path)
+            self.dataChanged.emit(self.index(min(i), 0, parent),
+                                  self.index(max(i), 0, parent))
+
     def all_file(self):
         """All files under root.  """
 
         root_index = self.index(self.rootPath())
-        return [self.data(self.index(i, 0, root_index)) for i in range(self.rowCount(root_index))]
+        count = self.rowCount(root_index)
+        return [self.fileName(self.index(i, 0, root_index))
+                for i in range(count)]
+
+    def _children(self, parent, first=0, last=None):
+        if last is None:
+            last = self.rowCount(parent) - 1
+        return [self.fileName(self.index(i, 0, parent))
+                for i in range(first, last + 1)]
+
+    def version_index(self, path):
+        """Version index for a loaded directory.
+
+        Args:
+            path (str): Directory path.
+
+        Returns:
+            VersionIndex: Index, None if directory not loaded yet.
+        """
+
+        return self.version_indexes.get(path)
+
+    def sequence_index(self, path):
+        """Sequence index for a loaded directory.
+
+        Args:
+            path (str): Directory path.
+
+        Returns:
+            SequenceIndex: Index, None if directory not loaded yet.
+        """
+
+        return self.sequence_indexes.get(path)
+
+    def _on_directory_loaded(self, path):
+        parent = self.index(path)
+        children = self._children(parent)
+        self.version_indexes[self.filePath(parent)] = VersionIndex(children)
+        self.sequence_indexes[self.filePath(parent)] = SequenceIndex(children)
+        self.versions_changed.emit(self.filePath(parent))
+
+    def _on_rows_inserted(self, parent, first, last):
+        path = self.filePath(parent)
+        children = self._children(parent, first, last)
+        index = self.version_indexes.setdefault(path, VersionIndex())
+        sequences = self.sequence_indexes.setdefault(path, SequenceIndex())
+        if bool(index.add(children)) | sequences.add(children):
+            self.versions_changed.emit(path)
+
+    def _on_rows_about_to_be_removed(self, parent, first, last):
+        for i in range(first, last + 1):
+            key = self.index(i, 0, parent).internalId()
+            record = self.records.pop(key, None)
+            if record is not None:
+                self.statuses.get(record.status, {}).pop(key, None)
+            self.checked.pop(key, None)
+        path = self.filePath(parent)
+        children = self._children(parent, first, last)
+        is_changed = False
+        index = self.version_indexes.get(path)
+        if index is not None:
+            is_changed |= bool(index.remove(children))
+        sequences = self.sequence_indexes.get(path)
+        if sequences is not None:
+            is_changed |= sequences.remove(children)
+        if is_changed:
+            self.versions_changed.emit(path)
+
+    def _on_file_renamed(self, path, old_name, new_name):
+        path = self.filePath(self.index(path))
+        is_changed = False
+        index = self.version_indexes.get(path)
+        if index is not None:
+            is_changed |= bool(index.remove([old_name]) |
+                               index.add([new_name]))
+        sequences = self.sequence_indexes.get(path)
+        if sequences is not None:
+            is_changed |= (sequences.remove([old_name]) |
+                           sequences.add([new_name]))
+        if is_changed:
+            self.versions_changed.emit(path)
 
 
 class VersionFilterProxyModel(QSortFilterProxyModel):
     """Filter data by version.  """
 
+    def setSourceModel(self, model):
+        """Override.  """
+        # pylint: disable=invalid-name
+
+        assert isinstance(model, DirectoryModel)
+        super(VersionFilterProxyModel, self).setSourceModel(model)
+        model.versions_changed.connect(self._on_versions_changed)
+
+    def _on_versions_changed(self, path):
+        model = self.sourceModel()
+        if path == model.filePath(model.index(model.rootPath())):
+            self.invalidateFilter()
+
     def filterAcceptsRow(self, source_row, source_parent):
         """Override.  """
         # pylint: disable=invalid-name
@@ -77,16 +394,79 @@ class VersionFilterProxyModel(QSortFilterProxyModel):
         model = self.sourceModel()
         assert isinstance(model, DirectoryModel)
 
-        data = model.data(model.index(source_row, 0, source_parent))
-        all_file = model.all_file()
-        return data not in all_file or data in version_filter(all_file)
+        path = model.filePath(source_parent)
+        if path != model.filePath(model.index(model.rootPath())):
+            return True
+        name = model.fileName(model.index(source_row, 0, source_parent))
+        index = model.version_index(path)
+        if index is not None and not index.is_latest(name):
+            return False
+        sequences = model.sequence_index(path)
+        return sequences is None or sequences.is_head(name)
 
     def all_files(self):
         """All files in display.  """
 
         root_index = self.root_index()
         count = self.rowCount(root_index)
-        return [self.data(self.index(i, 0, root_index)) for i in range(count)]
+        return [self.file_name(self.index(i, 0, root_index))
+                for i in range(count)]
+
+    def file_name(self, index):
+        """Wrapper for `self.sourceModel().fileName`.  """
+
+        return self.sourceModel().fileName(self.mapToSource(index))
+
+    def set_many(self, items):
+        """Wrapper for `self.sourceModel().set_many`.  """
+
+        self.sourceModel().set_many(
+            (self.mapToSource(index), values) for index, values in items)
+
+    def _visible_rows(self, indexes):
+        model = self.sourceModel()
+        root_index = self.root_index()
+        ret = []
+        for i in indexes:
+            if not i.isValid():
+                continue
+            index = model.index(i.row(), 0, i.parent())
+            proxy_index = self.mapFromSource(index)
+            if proxy_index.isValid() and proxy_index.parent() == root_index:
+                ret.append(index)
+        return ret
+
+    def checked_rows(self):
+        """Checked rows in display under root, costs O(checked).
+
+        Returns:
+            list[QModelIndex]: Source model indexes.
+        """
+
+        return self._visible_rows(list(self.sourceModel().checked.values()))
+
+    def status_rows(self, status):
+        """Rows of a status in display under root, costs O(rows of status).
+
+        Args:
+            status (str): Row status.
+
+        Returns:
+            list[QModelIndex]: Source model indexes.
+        """
+
+        return self._visible_rows(
+            list(self.sourceModel().statuses.get(status, {}).values()))
+
+    def checked_count(self):
+        """Count of checked rows under root, costs O(checked).  """
+
+        return len(self.checked_rows())
+
+    def status_count(self, status):
+        """Count of rows of a status under root, costs O(rows of status).  """
+
+        return len(self.status_rows(status))
 
     def checked_files(self):
         """All checked files.  """
@@ -97,8 +477,7 @@ class VersionFilterProxyModel(QSortFilterProxyModel):
         for i in range(count):
             index = self.index(i, 0, root_index)
             if self.data(index, Qt.CheckStateRole):
-                data = self.data(index)
-                ret.append(data)
+                ret.append(self.file_name(index))
         return ret
 
     def root_index(self):
@@ -131,3 +510,44 @@ class VersionFilterProxyModel(QSortFilterProxyModel):
 
         index = self.mapToSource(index)
         return self.sourceModel().filePath(index)
+
+
+class StatusFilterProxyModel(VersionFilterProxyModel):
+    """Filter data by version and row status.
+
+    Rows under root without status are hidden when filtering,
+    except directories that can be entered.
+    """
+
+    def __init__(self, parent=None):
+        super(StatusFilterProxyModel, self).__init__(parent)
+        self.statuses = None
+
+    def set_statuses(self, statuses):
+        """Show only rows of these statuses.
+
+        Args:
+            statuses (Iterable[str]): Row statuses, None to show all.
+        """
+
+        self.statuses = None if statuses is None else set(statuses)
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        """Override.  """
+        # pylint: disable=invalid-name
+
+        if not super(StatusFilterProxyModel, self).filterAcceptsRow(
+                source_row, source_parent):
+            return False
+        if self.statuses is None:
+            return True
+        model = self.sourceModel()
+        if model.filePath(source_parent) != model.filePath(
+                model.index(model.rootPath())):
+            return True
+        index = model.index(source_row, 0, source_parent)
+        status = model.data(index, ROLE_STATUS)
+        if status is None and model.isDir(index):
+            return True
+        return status in self.statuses
@@ -0,0 +1,123 @@
+# -*- coding=UTF-8 -*-
+"""Lightweight preview images for entry image.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+
+import six
+
+from .core import guess_type
+from .manifest import sample_hash
+from .util import CONFIG
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+LOGGER = logging.getLogger(__name__)
+
+PREVIEW_DIR = os.path.join(tempfile.gettempdir(), 'wlf.uploader.preview')
+MAX_SIZE = 1920
+# Images smaller than this are used as preview directly.
+MIN_SOURCE_SIZE = 2 * 1024 * 1024
+
+# Executable path keyed by configured name, None when not found.
+_EXECUTABLES = {}
+_LOCK = threading.Lock()
+
+
+def _is_mime(path, type_):
+    mime = guess_type(path)
+    return bool(mime and mime.startswith(type_))
+
+
+def _executable(name):
+    """Find executable once, warn once when it is missing.
+
+    Args:
+        name (str): Executable name or path.
+
+    Returns:
+        str: Executable path, None if not found.
+    """
+
+    with _LOCK:
+        if name not in _EXECUTABLES:
+            ret = _EXECUTABLES[name] = which(name)
+            if ret is None:
+                LOGGER.warning(
+                    'Preview disabled, executable not found: %s', name)
+        return _EXECUTABLES[name]
+
+
+def _ffmpeg(executable, src, dst, max_size):
+    cmd = [executable, '-y', '-hide_banner', '-loglevel', 'error',
+           '-i', src, '-frames:v', '1',
+           '-vf', "scale='min({0},iw)':-2".format(max_size),
+           '-q:v', '3', dst]
+    startupinfo = None
+    if os.name == 'nt':
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    with open(os.devnull, 'wb') as devnull:
+        proc = subprocess.Popen(cmd, stdout=devnull, stderr=subprocess.PIPE,
+                                startupinfo=startupinfo)
+        _, stderr = proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(stderr.decode('utf-8', 'replace'))
+
+
+def preview(path, max_size=MAX_SIZE):
+    """Downscaled jpg preview of a image or first frame of a video.
+
+    Previews are cached in `PREVIEW_DIR` keyed by content hash,
+    so resubmit the same file reuses it.
+
+    Args:
+        path (str): Image or video file path.
+        max_size (int, optional): Defaults to MAX_SIZE. Max preview width.
+
+    Returns:
+        str: Preview path, None if not available.
+    """
+
+    if _is_mime(path, 'image'):
+        if ((_is_mime(path, 'image/jpeg') or _is_mime(path, 'image/png'))
+                and os.path.getsize(path) < MIN_SOURCE_SIZE):
+            return path
+    elif not _is_mime(path, 'video'):
+        return None
+    executable = _executable(CONFIG['FFMPEG'])
+    if executable is None:
+        return None
+
+    ret = os.path.join(
+        PREVIEW_DIR, '{0}.{1}.jpg'.format(sample_hash(path), max_size))
+    if os.path.exists(ret):
+        return ret
+    if not os.path.isdir(PREVIEW_DIR):
+        try:
+            os.makedirs(PREVIEW_DIR)
+        except OSError:
+            pass
+    fd, tmp = tempfile.mkstemp('.jpg', dir=PREVIEW_DIR)
+    os.close(fd)
+    try:
+        _ffmpeg(executable, path, tmp, max_size)
+        if not os.path.exists(ret):
+            os.rename(tmp, ret)
+    except (OSError, RuntimeError) as ex:
+        LOGGER.warning('Generate preview failed: %s: %s',
+                       path, ' '.join(six.text_type(ex).split()))
+        return None
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return ret
@@ -0,0 +1,222 @@
+# -*- coding=UTF-8 -*-
+"""Resolve files to CGTeamWork entries in batch.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import logging
+import re
+from collections import namedtuple
+from functools import partial
+
+import six
+from six.moves import map
+
+import cgtwq
+from cgtwq.helper.wlf import DatabaseError, get_entry_by_file
+from wlf.path import PurePath
+
+from .stats import STATS
+
+LOGGER = logging.getLogger(__name__)
+
+SHOT_FIELD = 'shot.entity'
+FIELDS = ('id', SHOT_FIELD, 'account_id', 'artist')
+
+
+class Resolution(
+        namedtuple('Resolution',
+                   ('filename', 'pipeline', 'database', 'module',
+                    'entry_id', 'submit_dir', 'account_id', 'artist',
+                    'error'))):
+    """Resolve result of a file, `error` is set when failed.  """
+
+    @classmethod
+    def failed(cls, filename, pipeline, error):
+        """Create a failed resolution.  """
+
+        return cls(filename, pipeline, None, None, None, None, None, None,
+                   error)
+
+    def entry(self):
+        """Entry object for this resolution, no server call.
+
+        Returns:
+            cgtwq.Entry: Resolved entry.
+        """
+
+        module = cgtwq.Database(self.database).module(self.module)
+        return module.select(self.entry_id).to_entry()
+
+    def dest(self):
+        """Upload destination.
+
+        Returns:
+            str: Destination path in posix style.
+        """
+
+        path = PurePath(self.filename)
+        return (PurePath(self.submit_dir) /
+                PurePath(path.shot).with_suffix(path.suffix.lower())).as_posix()
+
+    def sequence_dest(self):
+        """Upload destination folder for a image sequence.
+
+        Returns:
+            str: Destination folder in posix style, named by shot.
+        """
+
+        return (PurePath(self.submit_dir) /
+                PurePath(self.filename).shot).as_posix()
+
+
+def _group_key(filename):
+    # Database is guessed from file name prefix.
+    match = re.match(r'[A-Za-z]+', PurePath(filename).shot)
+    return match.group(0).upper() if match else ''
+
+
+def _is_empty_selection(ex):
+    return isinstance(ex, ValueError) and ex.args[:1] == ('Empty selection.',)
+
+
+def _resolve_file(filename, pipeline):
+    try:
+        with STATS.timer('rpc.get_entry_by_file'):
+            entry = get_entry_by_file(filename, pipeline)
+    except DatabaseError:
+        return None, Resolution.failed(filename, pipeline, '找不到对应数据库')
+    except cgtwq.LoginError:
+        raise
+    except Exception as ex:  # pylint: disable=broad-except
+        if _is_empty_selection(ex):
+            return None, Resolution.failed(filename, pipeline, '找不到对应任务')
+        # Fail this file only, other files are still resolved.
+        LOGGER.error('Resolve failed: %s', filename, exc_info=True)
+        return None, Resolution.failed(
+            filename, pipeline, six.text_type(ex))
+    assert isinstance(entry, cgtwq.Entry), type(entry)
+    module = entry.module
+    return entry, Resolution(
+        filename, pipeline, module.database.name, module.name, entry[0],
+        None, entry['account_id'], entry['artist'], None)
+
+
+def _resolve_group(filenames, pipeline):
+    ret = []
+    pending = list(filenames)
+    entry = None
+    while pending and entry is None:
+        filename = pending.pop(0)
+        entry, resolution = _resolve_file(filename, pipeline)
+        ret.append(resolution)
+        if entry is None and resolution.error == '找不到对应数据库':
+            ret.extend(Resolution.failed(i, pipeline, resolution.error)
+                       for i in pending)
+            return ret
+    if not pending:
+        return ret
+
+    module = entry.module
+    shots = {}
+    for i in pending:
+        shots.setdefault(PurePath(i).shot.lower(), []).append(i)
+    try:
+        with STATS.timer('rpc.select'):
+            fields = module.filter(
+                (cgtwq.Field('pipeline') == pipeline) &
+                cgtwq.Field(SHOT_FIELD).in_(
+                    list(set(PurePath(i).shot
+                             for i in pending + [filename])))
+            ).get_fields(*FIELDS)
+    except cgtwq.LoginError:
+        raise
+    except Exception as ex:  # pylint: disable=broad-except
+        if not _is_empty_selection(ex):
+            LOGGER.warning('Batch select failed, resolve each file.',
+                           exc_info=True)
+        # Without batch result every file goes to helper.
+        fields = ()
+    rows = {}
+    for row in fields:
+        rows.setdefault(row[1].lower(), []).append(row)
+    # Batch result is reliable only when it can find the known entry.
+    is_reliable = PurePath(filename).shot.lower() in rows
+
+    for shot, files in shots.items():
+        matched = rows.get(shot, ())
+        if len(matched) == 1:
+            entry_id, _, account_id, artist = matched[0]
+            ret.extend(Resolution(
+                i, pipeline, module.database.name, module.name,
+                entry_id, None, account_id, artist, None) for i in files)
+        elif not matched and is_reliable:
+            ret.extend(Resolution.failed(i, pipeline, '找不到对应任务')
+                       for i in files)
+        else:
+            # Let helper decide, keeps behavior for unexpected data.
+            ret.extend(_resolve_file(i, pipeline)[1] for i in files)
+    return ret
+
+
+def _submit_dir(key):
+    database, module, entry_id = key
+    try:
+        entry = cgtwq.Database(database).module(
+            module).select(entry_id).to_entry()
+        with STATS.timer('rpc.get_submit'):
+            return key, entry.filebox.get_submit().path, None
+    except cgtwq.LoginError:
+        raise
+    except Exception as ex:  # pylint: disable=broad-except
+        # Fail files of this entry only.
+        LOGGER.error('Get submit folder failed: %s', key, exc_info=True)
+        return key, None, six.text_type(ex)
+
+
+def resolve_files(filenames, pipeline, pool=None):
+    """Resolve files to entries, query count grows with database count.
+
+    Files are grouped by database, each group need one lookup to find
+    the database module and one select for all entries in it.
+    Submit filebox has no batch api, it is queried once per entry.
+
+    Args:
+        filenames (Iterable[str]): File names to resolve.
+        pipeline (str): Pipeline name.
+        pool (multiprocessing.pool.Pool, optional): Defaults to None.
+            Pool for running queries in parallel.
+
+    Yields:
+        Resolution: Resolve result for each file.
+    """
+
+    map_ = pool.imap_unordered if pool else map
+    groups = {}
+    for i in filenames:
+        groups.setdefault(_group_key(i), []).append(i)
+
+    resolved = []
+    for results in map_(partial(_resolve_group, pipeline=pipeline),
+                        groups.values()):
+        for i in results:
+            if i.error:
+                yield i
+            else:
+                resolved.append(i)
+
+    submit_dirs = {}
+    errors = {}
+    for key, path, error in map_(
+            _submit_dir,
+            set((i.database, i.module, i.entry_id) for i in resolved)):
+        if error is None:
+            submit_dirs[key] = path
+        else:
+            errors[key] = error
+    for i in resolved:
+        key = (i.database, i.module, i.entry_id)
+        if key in errors:
+            yield Resolution.failed(i.filename, pipeline, errors[key])
+        else:
+            yield i._replace(submit_dir=submit_dirs[key])
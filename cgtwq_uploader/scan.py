@@ -0,0 +1,125 @@
+# -*- coding=UTF-8 -*-
+"""Streaming directory scan.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None  # pylint: disable=invalid-name
+
+FIRST_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 1000
+
+
+def _iter_files(directory):
+    if scandir is None:
+        for i in os.listdir(directory):
+            if os.path.isfile(os.path.join(directory, i)):
+                yield i
+        return
+
+    entries = scandir(directory)
+    try:
+        for i in entries:
+            if i.is_file():
+                yield i.name
+    finally:
+        if hasattr(entries, 'close'):
+            entries.close()
+
+
+def scan_files(directory,
+               first_batch_size=FIRST_BATCH_SIZE,
+               max_batch_size=MAX_BATCH_SIZE):
+    """Yield file names in batches as soon as they are listed.
+
+    Batch size starts small so first results come quickly,
+    then doubles up to `max_batch_size`.
+
+    Args:
+        directory (str): Directory path.
+        first_batch_size (int, optional): Defaults to FIRST_BATCH_SIZE.
+        max_batch_size (int, optional): Defaults to MAX_BATCH_SIZE.
+
+    Yields:
+        list[str]: File names.
+    """
+
+    size = first_batch_size
+    batch = []
+    for i in _iter_files(directory):
+        batch.append(i)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+            size = min(size * 2, max_batch_size)
+    if batch:
+        yield batch
+
+
+def _list_dir(directory):
+    # Symlinked directories are not followed, they may form a cycle.
+    files, dirs = [], []
+    try:
+        if scandir is None:
+            for i in os.listdir(directory):
+                path = os.path.join(directory, i)
+                if os.path.islink(path):
+                    if os.path.isfile(path):
+                        files.append(i)
+                elif os.path.isdir(path):
+                    dirs.append(i)
+                else:
+                    files.append(i)
+        else:
+            entries = scandir(directory)
+            try:
+                for i in entries:
+                    if i.is_dir(follow_symlinks=False):
+                        dirs.append(i.name)
+                    elif i.is_file():
+                        files.append(i.name)
+            finally:
+                if hasattr(entries, 'close'):
+                    entries.close()
+    except OSError:
+        pass
+    return directory, files, dirs
+
+
+def scan_tree(directory, pool=None, exclude=()):
+    """Yield file names of directory and all sub directories.
+
+    Directories of same depth are listed in parallel when pool given.
+
+    Args:
+        directory (str): Root directory path.
+        pool (multiprocessing.pool.Pool, optional): Defaults to None.
+            Pool for listing directories in parallel.
+        exclude (Iterable[str], optional): Defaults to (). Directory
+            names to skip, hidden directories and symlinks to
+            directories are always skipped.
+
+    Yields:
+        tuple[str, list[str]]: Directory path in posix style
+            and all file names in it.
+    """
+
+    map_ = pool.imap_unordered if pool else map
+    exclude = set(exclude)
+    level = [directory.replace('\\', '/').rstrip('/') or '/']
+    while level:
+        next_level = []
+        for path, files, dirs in map_(_list_dir, level):
+            yield path, files
+            next_level.extend(
+                '{}/{}'.format(path.rstrip('/'), i) for i in dirs
+                if i not in exclude and not i.startswith('.'))
+        level = next_level
@@ -0,0 +1,293 @@
+# -*- coding=UTF-8 -*-
+"""Image sequence detection.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import re
+
+from wlf.path import PurePath
+
+from .scan import scandir
+
+SEQUENCE_EXT = ('.exr', '.tga', '.png', '.tif', '.tiff', '.jpg', '.jpeg',
+                '.dpx')
+FRAME_PATTERN = re.compile(r'^(.+?\.)(\d{3,})(\.[^.]+)$')
+
+
+def _match(filename):
+    match = FRAME_PATTERN.match(filename)
+    if not match:
+        return None
+    head, _, ext = match.groups()
+    if ext.lower() not in SEQUENCE_EXT:
+        return None
+    # Number that is part of shot name is not a frame,
+    # e.g. `SNJYW_EP01_001.png`.
+    if PurePath(filename).shot != PurePath(head[:-1] + ext).shot:
+        return None
+    return match
+
+
+def split_frame(filename):
+    """Split sequence key and frame number from a frame file name.
+
+    Frame number must be separated by dots, frames with same key
+    always have same shot.
+
+    Args:
+        filename (str): File name, e.g. `SNJYW_EP01_01_v2.1001.exr`.
+
+    Returns:
+        tuple[str, int]: Sequence key like `SNJYW_EP01_01_v2.####.exr`
+            and frame number, None if filename is not a frame.
+    """
+
+    match = _match(filename)
+    if not match:
+        return None
+    head, frame, ext = match.groups()
+    return '{}{}{}'.format(head, '#' * len(frame), ext), int(frame)
+
+
+def resolve_name(filename):
+    """Name for resolving a frame without frame number.
+
+    Args:
+        filename (str): Frame file name, e.g. `SNJYW_EP01_01_v2.1001.exr`.
+
+    Returns:
+        str: Name like `SNJYW_EP01_01_v2.exr`, filename if not a frame.
+    """
+
+    match = _match(filename)
+    if not match:
+        return filename
+    head, _, ext = match.groups()
+    return head[:-1] + ext
+
+
+def frame_dest(directory, filename):
+    """Upload destination for a frame.
+
+    Args:
+        directory (str): Sequence destination folder, named by shot.
+        filename (str): Frame file name.
+
+    Returns:
+        str: Destination path in posix style,
+            `{directory}/{shot}.{frame}{ext}`.
+    """
+
+    _, frame, ext = FRAME_PATTERN.match(filename).groups()
+    directory = directory.rstrip('/')
+    return '{}/{}.{}{}'.format(
+        directory, directory.rsplit('/', 1)[-1], frame, ext.lower())
+
+
+def label(key, frames):
+    """Display label for a sequence.
+
+    Args:
+        key (str): Sequence key.
+        frames (list[str]): Frame file names.
+
+    Returns:
+        str: Label like `A.####.exr [1001-1100] (100帧)`.
+    """
+
+    numbers = [split_frame(i)[1] for i in frames]
+    return '{} [{}-{}] ({}帧)'.format(
+        key, min(numbers), max(numbers), len(frames))
+
+
+def group_files(filenames):
+    """Group frames by sequence, a single frame is a normal file.
+
+    Args:
+        filenames (Iterable[str]): File names.
+
+    Returns:
+        tuple[list[str], dict[str, list[str]]]: Normal files and
+            sequences, sequence frames are sorted with first frame
+            as key.
+    """
+
+    files = []
+    groups = {}
+    for i in filenames:
+        split = split_frame(i)
+        if split is None:
+            files.append(i)
+        else:
+            groups.setdefault(split[0], []).append((split[1], i))
+    sequences = {}
+    for frames in groups.values():
+        if len(frames) == 1:
+            files.append(frames[0][1])
+        else:
+            frames = [i[1] for i in sorted(frames)]
+            sequences[frames[0]] = frames
+    return files, sequences
+
+
+def is_uploaded(frames, directory):
+    """Whether all frames exist at destination with same size.
+
+    Lists destination folder once, instead of stat each frame on server.
+
+    Args:
+        frames (list[str]): Local frame paths.
+        directory (str): Sequence destination folder.
+
+    Returns:
+        bool: True if all frames uploaded.
+    """
+
+    sizes = remote_sizes(directory)
+    for i in frames:
+        size = sizes.get(frame_dest(directory, os.path.basename(i))
+                         .rsplit('/', 1)[-1])
+        if size is None or size != os.path.getsize(i):
+            return False
+    return True
+
+
+def remote_sizes(directory):
+    """File sizes in a folder.
+
+    Args:
+        directory (str): Folder path.
+
+    Returns:
+        dict[str, int]: Size keyed by file name, empty if not exists.
+    """
+
+    try:
+        if scandir is None:
+            return {i: os.path.getsize(os.path.join(directory, i))
+                    for i in os.listdir(directory)}
+        return {i.name: i.stat().st_size for i in scandir(directory)
+                if i.is_file()}
+    except OSError:
+        return {}
+
+
+class SequenceIndex(object):
+    """Sequence lookup for file names in one directory.
+
+    Only first frame of a sequence is shown,
+    a sequence with single frame is a normal file.
+    """
+
+    def __init__(self, names=()):
+        self._keys = {}
+        self._groups = {}
+        self._heads = {}
+        self._labels = {}
+        self.add(names)
+
+    def _head(self, key):
+        try:
+            return self._heads[key]
+        except KeyError:
+            ret = self._heads[key] = min(self._groups[key])[1]
+            return ret
+
+    def label(self, name):
+        """Display label of a sequence head.
+
+        Args:
+            name (str): First frame file name.
+
+        Returns:
+            str: Sequence label, None if name is not a sequence.
+        """
+
+        if not self.is_sequence(name):
+            return None
+        key = self._keys[name]
+        try:
+            return self._labels[key]
+        except KeyError:
+            ret = self._labels[key] = label(key, self.frames(name))
+            return ret
+
+    def key(self, name):
+        """Sequence key of name, None if not a frame.  """
+
+        return self._keys.get(name)
+
+    def frames(self, name):
+        """Sorted frames of the sequence that name belongs to.
+
+        Args:
+            name (str): Frame file name.
+
+        Returns:
+            list[str]: Frames, only name itself if not a sequence.
+        """
+
+        key = self._keys.get(name)
+        group = self._groups.get(key)
+        if key is None or len(group) < 2:
+            return [name]
+        return [i[1] for i in sorted(group)]
+
+    def is_head(self, name):
+        """Whether name should be shown, it is first frame or not a frame.  """
+
+        key = self._keys.get(name)
+        if key is None:
+            return True
+        return self._head(key) == name
+
+    def is_sequence(self, name):
+        """Whether name belongs to a sequence with more than one frame.  """
+
+        key = self._keys.get(name)
+        return key is not None and len(self._groups[key]) > 1
+
+    def add(self, names):
+        """Add names to index.
+
+        Returns:
+            bool: Whether any sequence changed.
+        """
+
+        ret = False
+        for name in names:
+            if name in self._keys:
+                continue
+            split = split_frame(name)
+            if split is None:
+                continue
+            key, frame = split
+            self._keys[name] = key
+            self._groups.setdefault(key, set()).add((frame, name))
+            self._heads.pop(key, None)
+            self._labels.pop(key, None)
+            ret = True
+        return ret
+
+    def remove(self, names):
+        """Remove names from index.
+
+        Returns:
+            bool: Whether any sequence changed.
+        """
+
+        ret = False
+        for name in names:
+            key = self._keys.pop(name, None)
+            if key is None:
+                continue
+            group = self._groups[key]
+            group.discard((split_frame(name)[1], name))
+            self._heads.pop(key, None)
+            self._labels.pop(key, None)
+            if not group:
+                del self._groups[key]
+            ret = True
+        return ret
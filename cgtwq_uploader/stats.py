@@ -0,0 +1,135 @@
+# -*- coding=UTF-8 -*-
+"""Stage timers and counters for slow path reports.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Stats(object):
+    """Thread-safe stage timers and counters.
+
+    Stage names are dotted, e.g. `resolve.get_entry_by_file`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = Counter()
+        self.started = time.time()
+
+    @contextmanager
+    def timer(self, name):
+        """Time a stage.
+
+        Args:
+            name (str): Stage name.
+        """
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.time() - start)
+
+    def iterate(self, name, iterable):
+        """Time each item produced by iterable as a stage.
+
+        Args:
+            name (str): Stage name.
+            iterable (Iterable): Items to time.
+
+        Yields:
+            Items from iterable.
+        """
+
+        iterator = iter(iterable)
+        while True:
+            start = time.time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.time() - start, 0)
+                return
+            self.add_time(name, time.time() - start)
+            yield item
+
+    def add_time(self, name, seconds, count=1):
+        """Record time spent on a stage.
+
+        Args:
+            name (str): Stage name.
+            seconds (float): Time spent.
+            count (int, optional): Defaults to 1. Times the stage ran.
+        """
+
+        with self._lock:
+            count_, total, max_ = self._timers.get(name, (0, 0.0, 0.0))
+            self._timers[name] = (count_ + count, total + seconds,
+                                  max(max_, seconds))
+
+    def count(self, name, value=1):
+        """Increase a counter.  """
+
+        with self._lock:
+            self._counters[name] += value
+
+    def reset(self):
+        """Clear all records.  """
+
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """Records as plain data.
+
+        Returns:
+            dict: Timers with count, total and max seconds, and counters.
+        """
+
+        with self._lock:
+            return {
+                'elapsed': time.time() - self.started,
+                'timers': {k: {'count': v[0], 'total': v[1], 'max': v[2]}
+                           for k, v in self._timers.items()},
+                'counters': dict(self._counters),
+            }
+
+    def dumps(self, indent=None):
+        """Records as json.
+
+        Args:
+            indent (int, optional): Defaults to None. Json indent,
+                one line when None.
+
+        Returns:
+            str: Json text.
+        """
+
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
+
+    def summary(self, limit=4):
+        """Short text of the slowest stages.
+
+        Args:
+            limit (int, optional): Defaults to 4. Max stage count.
+
+        Returns:
+            str: Summary text.
+        """
+
+        timers = self.snapshot()['timers']
+        slowest = sorted(timers.items(), key=lambda i: i[1]['total'],
+                         reverse=True)[:limit]
+        return ', '.join('{} {:.2f}s/{}'.format(k, v['total'], v['count'])
+                         for k, v in slowest)
+
+
+STATS = Stats()
@@ -0,0 +1,131 @@
+# -*- coding=UTF-8 -*-
+"""Bandwidth limit and adaptive concurrency for transfers.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import logging
+import threading
+import time
+
+from .stats import STATS
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """Bytes per second limit shared by threads.
+
+    Unused allowance is kept for at most one second,
+    so a idle period does not allow a long burst.
+
+    Args:
+        rate (float): Bytes per second, no limit when not positive.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.time()
+
+    def consume(self, size):
+        """Take allowance for size bytes, sleep when exceeds limit.
+
+        Args:
+            size (int): Bytes transferred.
+        """
+
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.time()
+            self._next = max(self._next, now - 1) + size / self.rate
+            delay = self._next - now
+        if delay > 0:
+            STATS.add_time('upload.throttle', delay)
+            time.sleep(delay)
+
+
+class AdaptiveLimit(object):
+    """Concurrency limit that follows measured throughput.
+
+    Used as context manager around each transfer. Every `interval`
+    seconds of saturated transfer, the limit moves one step, and turns
+    back when throughput dropped. It holds while throughput is flat,
+    e.g. limited by `TokenBucket` or server.
+
+    Args:
+        maximum (int): Max concurrent transfers.
+        minimum (int, optional): Defaults to 1. Min concurrent transfers.
+        interval (float, optional): Defaults to 5. Seconds per measure.
+        is_adaptive (bool, optional): Defaults to True.
+            Limit is fixed at maximum when False.
+    """
+
+    # Throughput change less than this ratio is treated as flat.
+    tolerance = 0.1
+
+    def __init__(self, maximum, minimum=1, interval=5, is_adaptive=True):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.interval = interval
+        self.is_adaptive = is_adaptive
+        self.limit = (max(self.minimum, min(2, self.maximum))
+                      if is_adaptive else self.maximum)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._bytes = 0
+        self._started = time.time()
+        self._last_rate = None
+        self._step = 1
+
+    def __enter__(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            if not self._active:
+                # Idle time is not throughput of current limit.
+                self._bytes = 0
+                self._started = time.time()
+            self._active += 1
+        return self
+
+    def __exit__(self, *_):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def add(self, size):
+        """Count transferred bytes, adjust limit when a measure is done.
+
+        Args:
+            size (int): Bytes transferred.
+        """
+
+        if not self.is_adaptive:
+            return
+        with self._cond:
+            self._bytes += size
+            now = time.time()
+            elapsed = now - self._started
+            if elapsed < self.interval:
+                return
+            rate = self._bytes / elapsed
+            self._bytes = 0
+            self._started = now
+            last_rate, self._last_rate = self._last_rate, rate
+            if self._active < self.limit:
+                # Not enough work to tell what limit is better.
+                return
+            if last_rate is not None:
+                if rate < last_rate * (1 - self.tolerance):
+                    self._step = -self._step
+                elif rate < last_rate * (1 + self.tolerance):
+                    return
+            limit = min(self.maximum,
+                        max(self.minimum, self.limit + self._step))
+            if limit != self.limit:
+                LOGGER.debug('Transfer limit %d -> %d at %.1f MiB/s',
+                             self.limit, limit, rate / 1024 / 1024)
+                self.limit = limit
+                self._cond.notify_all()
@@ -0,0 +1,150 @@
+# -*- coding=UTF-8 -*-
+"""Resumable file transfer.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import json
+import logging
+import os
+import shutil
+import zlib
+
+LOGGER = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8 * 1024 * 1024
+CHECKPOINT_INTERVAL = 8
+PART_SUFFIX = '.part'
+CHECKPOINT_SUFFIX = '.part.checkpoint'
+
+
+def _crc(data):
+    return zlib.crc32(data) & 0xffffffff
+
+
+def _replace(src, dst):
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2 can not rename over existed file on windows.
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+class Checkpoint(object):
+    """Copy progress saved beside the partial file.
+
+    `crc` is checksum of the last chunk before `offset`,
+    used to verify partial file before resume.
+
+    Args:
+        path (str): Checkpoint file path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.source = None
+        self.offset = 0
+        self.crc = 0
+
+    def load(self, source):
+        """Load checkpoint, reset when it was made for another source.
+
+        Args:
+            source (list): Source file identity, size and mtime.
+        """
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            data = {}
+        if data.get('source') != source:
+            data = {}
+        self.source = source
+        self.offset = data.get('offset', 0)
+        self.crc = data.get('crc', 0)
+
+    def save(self):
+        """Write checkpoint to disk.  """
+
+        with open(self.path, 'w') as f:
+            json.dump({'source': self.source,
+                       'offset': self.offset,
+                       'crc': self.crc}, f)
+
+    def remove(self):
+        """Remove checkpoint file.  """
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _resume_offset(part, checkpoint, chunk_size):
+    """Verified offset to resume from, 0 when part file is unusable.  """
+
+    if not checkpoint.offset or not os.path.exists(part):
+        return 0
+    if os.path.getsize(part) < checkpoint.offset:
+        return 0
+    with open(part, 'rb') as f:
+        start = max(0, checkpoint.offset - chunk_size)
+        f.seek(start)
+        if _crc(f.read(checkpoint.offset - start)) != checkpoint.crc:
+            LOGGER.warning('Checkpoint not match, restart: %s', part)
+            return 0
+    return checkpoint.offset
+
+
+def copy(src, dst, chunk_size=CHUNK_SIZE, on_progress=None):
+    """Copy file in chunks through a partial file then rename into place.
+
+    Progress is saved as a checkpoint every few chunks,
+    a failed copy continues from last checkpoint on next call.
+
+    Args:
+        src (str): Source path.
+        dst (str): Destination path.
+        chunk_size (int, optional): Defaults to CHUNK_SIZE. Bytes per read.
+        on_progress (Callable[[int], None], optional): Defaults to None.
+            Called with bytes count copied in each chunk.
+    """
+
+    dirname = os.path.dirname(dst)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    part = dst + PART_SUFFIX
+    stat = os.stat(src)
+    checkpoint = Checkpoint(dst + CHECKPOINT_SUFFIX)
+    checkpoint.load([stat.st_size, stat.st_mtime])
+    offset = _resume_offset(part, checkpoint, chunk_size)
+    if offset:
+        LOGGER.info('Resume copy from %d bytes: %s', offset, dst)
+    else:
+        checkpoint.offset = checkpoint.crc = 0
+
+    with open(src, 'rb') as f_src, \
+            open(part, 'r+b' if offset else 'wb') as f_dst:
+        f_src.seek(offset)
+        f_dst.seek(offset)
+        f_dst.truncate()
+        count = 0
+        while True:
+            data = f_src.read(chunk_size)
+            if not data:
+                break
+            f_dst.write(data)
+            checkpoint.offset += len(data)
+            checkpoint.crc = _crc(data)
+            count += 1
+            if on_progress:
+                on_progress(len(data))
+            if count % CHECKPOINT_INTERVAL == 0:
+                f_dst.flush()
+                os.fsync(f_dst.fileno())
+                checkpoint.save()
+
+    shutil.copystat(src, part)
+    _replace(part, dst)
+    checkpoint.remove()
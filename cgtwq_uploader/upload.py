@@ -0,0 +1,528 @@
+# -*- coding=UTF-8 -*-
+"""Upload scheduling.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+from collections import namedtuple
+from multiprocessing.dummy import Pool
+
+import six
+
+import cgtwq
+from cgtwq.helper.wlf import get_entry_by_file
+from wlf.path import PurePath
+
+from . import transfer
+from .core import guess_type
+from .journal import (STAGE_CANCELLED, STAGE_COPY, STAGE_DONE, STAGE_FAILED,
+                      STAGE_IMAGE, STAGE_SUBMIT)
+from .preview import preview
+from .stats import STATS
+from .throttle import AdaptiveLimit, TokenBucket
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TaskCancelledError(Exception):
+    """Task is cancelled before start.  """
+
+
+# Errors that will not go away on retry.
+PERMANENT_ERRORS = (TaskCancelledError, cgtwq.LoginError, cgtwq.AccountError,
+                    cgtwq.IDError)
+
+
+class UploadTask(
+    namedtuple('UploadTask',
+               ('label', 'src',
+                'dst', 'is_submit', 'pipeline',
+                'submit_note', 'resolution', 'frames', 'journal_id',
+                'priority'))):
+    """Upload task, `resolution` is the resolved entry when known.
+
+    For a image sequence, `src` is the first frame, `dst` is the
+    destination folder and `frames` is source and destination of each frame.
+    `journal_id` is record id in `UploadJournal` once recorded.
+    Copy of lower `priority` starts first, defaults to source size.
+    """
+
+    def __new__(cls, label, src, dst, is_submit, pipeline, submit_note,
+                resolution=None, frames=None, journal_id=None,
+                priority=None):
+        # pylint: disable=too-many-arguments
+        return super(UploadTask, cls).__new__(
+            cls, label, src, dst, is_submit, pipeline, submit_note,
+            resolution, frames, journal_id, priority)
+
+    def __str__(self):
+        return self.label
+
+    def entry(self):
+        """Entry of this task, only query server when not resolved.
+
+        Returns:
+            cgtwq.Entry: Task entry.
+        """
+
+        if self.resolution is not None and not self.resolution.error:
+            return self.resolution.entry()
+        with STATS.timer('rpc.get_entry_by_file'):
+            ret = get_entry_by_file(PurePath(self.src).name, self.pipeline)
+        assert isinstance(ret, cgtwq.Entry)
+        return ret
+
+    def is_image(self):
+        """Whether destination is a image.  """
+
+        mime = guess_type(self.dst)
+        return bool(mime and mime.startswith('image'))
+
+    def copy_priority(self):
+        """Priority in copy queue, small files first by default.
+
+        Returns:
+            int: Lower value starts first.
+        """
+
+        if self.priority is not None:
+            return self.priority
+        try:
+            size = os.path.getsize(self.src)
+        except OSError:
+            return 0
+        return size * len(self.frames) if self.frames else size
+
+
+def copy_file(task, manifest=None, on_progress=None):
+    """Copy task file to destination, resume from last failed copy.
+
+    Args:
+        task (UploadTask): Task to copy.
+        manifest (UploadManifest, optional): Defaults to None.
+            Record copied file in this manifest.
+        on_progress (Callable[[int], None], optional): Defaults to None.
+            Called with bytes count copied in each chunk.
+    """
+
+    assert isinstance(task, UploadTask)
+    with STATS.timer('upload.copy'):
+        transfer.copy(task.src, task.dst, on_progress=on_progress)
+    STATS.count('upload.bytes', os.path.getsize(task.src))
+    if manifest is not None:
+        manifest.record(task.src, task.dst)
+
+
+def copy_frame(src, dst, on_progress=None):
+    """Copy a sequence frame, skip when destination has same size.
+
+    Args:
+        src (str): Frame path.
+        dst (str): Destination path.
+        on_progress (Callable[[int], None], optional): Defaults to None.
+            Called with bytes count copied in each chunk.
+
+    Returns:
+        bool: False if skipped.
+    """
+
+    size = os.path.getsize(src)
+    try:
+        if os.path.getsize(dst) == size:
+            STATS.count('upload.frames_skipped')
+            return False
+    except OSError:
+        pass
+    with STATS.timer('upload.copy_frame'):
+        transfer.copy(src, dst, on_progress=on_progress)
+    STATS.count('upload.bytes', size)
+    return True
+
+
+def set_image(task, entry):
+    """Set entry image from a downscaled preview of uploaded file.
+
+    Args:
+        task (UploadTask): Uploaded task.
+        entry (cgtwq.Entry): Task entry.
+
+    Returns:
+        Image info for submit message, None if no preview for the task.
+    """
+
+    assert isinstance(task, UploadTask)
+    with STATS.timer('upload.preview'):
+        path = preview(task.src)
+    if path is None:
+        if not task.is_image():
+            return None
+        path = task.dst
+    with STATS.timer('rpc.set_image'):
+        return entry.set_image(path)
+
+
+def submit_file(task, entry, images=()):
+    """Submit uploaded file for entry.
+
+    Args:
+        task (UploadTask): Uploaded task.
+        entry (cgtwq.Entry): Task entry.
+        images (Iterable, optional): Defaults to (). Images for message.
+    """
+
+    assert isinstance(task, UploadTask)
+    message = cgtwq.Message(task.submit_note)
+    message.images.extend(images)
+    files = [i[1] for i in task.frames] if task.frames else [task.dst]
+    with STATS.timer('rpc.submit'):
+        entry.flow.submit(files, message=message)
+
+
+class UploadScheduler(object):
+    """Run upload tasks in parallel.
+
+    Copy, image and submit are separate stages with own queue and
+    concurrency limit, a task enter next stage as soon as its
+    current stage finished, so copies never wait for slow submits.
+    Frames of a image sequence are copied in parallel on the copy stage.
+    Copies wait in a queue ordered by task priority, so small files are
+    not stuck behind large ones. Copy speed is capped by
+    `bytes_per_second`, and concurrent copies follow measured throughput
+    when `is_adaptive`, up to `copy_workers`.
+    A failed stage is tried again after a delay that doubles each time.
+    When `journal` is given, stage of each task is recorded,
+    tasks left by a closed or crashed uploader can be resumed.
+    Worker threads are kept for later uploads until `close`.
+    Callbacks are called from worker threads.
+
+    Args:
+        copy_workers (int): Max concurrent file copy.
+        submit_workers (int): Max concurrent CGTeamWork submit.
+        image_workers (int): Max concurrent CGTeamWork image upload.
+        manifest (UploadManifest): Record copied files in this manifest.
+        on_task_finished (Callable[[UploadTask, Exception], None]):
+            Called when a task is done, exception is None when succeed.
+        on_finished (Callable[[], None]): Called when all tasks are done.
+        on_task_progress (Callable[[UploadTask, int, int], None], optional):
+            Called with done and total frame count after each frame copied.
+        journal (UploadJournal, optional): Record task stages in it.
+        retries (int, optional): Defaults to 0. Max retries of a stage.
+        retry_delay (float, optional): Defaults to 1.
+            Seconds before first retry.
+        bytes_per_second (float, optional): Defaults to 0.
+            Copy speed limit of all tasks, no limit when 0.
+        is_adaptive (bool, optional): Defaults to False.
+            Adjust concurrent copies by measured throughput.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, copy_workers=4, submit_workers=2, image_workers=2,
+                 manifest=None, on_task_finished=None, on_finished=None,
+                 on_task_progress=None, journal=None, retries=0,
+                 retry_delay=1, bytes_per_second=0, is_adaptive=False):
+        # pylint: disable=too-many-arguments
+        self.copy_workers = copy_workers
+        self.submit_workers = submit_workers
+        self.image_workers = image_workers
+        self.manifest = manifest
+        self.on_task_finished = on_task_finished or (lambda task, error: None)
+        self.on_finished = on_finished or (lambda: None)
+        self.on_task_progress = (
+            on_task_progress or (lambda task, done, total: None))
+        self.journal = journal
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.bandwidth = TokenBucket(bytes_per_second)
+        self.copy_limit = AdaptiveLimit(
+            copy_workers, is_adaptive=is_adaptive)
+        self.is_cancelled = False
+        self._is_closed = False
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._timers = set()
+        self._copy_queue = []
+        self._copy_counter = itertools.count()
+        self._copy_pool = None
+        self._image_pool = None
+        self._submit_pool = None
+        self._finished = threading.Event()
+
+    def start(self, tasks):
+        """Start upload, returns immediately.
+
+        Args:
+            tasks (list[UploadTask]): Tasks to upload.
+        """
+
+        tasks = list(tasks)
+        if self.journal is not None:
+            tasks = [i._replace(journal_id=j) for i, j
+                     in zip(tasks, self.journal.add_many(tasks))]
+        self._start([(STAGE_COPY, i) for i in tasks])
+
+    def resume(self):
+        """Start pending tasks recorded in journal, returns immediately.
+
+        Each task starts from its recorded stage,
+        so finished copies are not copied again.
+
+        Returns:
+            int: Resumed task count.
+        """
+
+        if self.journal is None:
+            return 0
+        items = [(stage, UploadTask(journal_id=task_id, **data))
+                 for task_id, stage, data in self.journal.pending()]
+        if items:
+            LOGGER.info('Resume %d tasks.', len(items))
+            self._start(items)
+        return len(items)
+
+    def _start(self, items):
+        self.is_cancelled = False
+        self._is_closed = False
+        self._remaining = len(items)
+        self._finished.clear()
+        if not items:
+            self._finished.set()
+            self.on_finished()
+            return
+        if self._copy_pool is None:
+            self._copy_pool = Pool(self.copy_workers)
+            self._image_pool = Pool(self.image_workers)
+            self._submit_pool = Pool(self.submit_workers)
+        # Queue all copies before any starts, so priority applies.
+        self._queue_copies([
+            (task.copy_priority(), self._copy, (task,), 0)
+            for stage, task in items if stage == STAGE_COPY])
+        for stage, task in items:
+            if stage != STAGE_COPY:
+                self._run(stage, task)
+
+    def cancel(self):
+        """Cancel tasks not started yet.  """
+
+        self.is_cancelled = True
+
+    def close(self):
+        """Cancel remaining tasks and release worker threads.
+
+        Running copies are aborted at next chunk, their partial files
+        are kept for resume. Running image and submit calls are waited,
+        so journal is up to date when this returns.
+        Unfinished tasks stay pending in journal.
+        """
+
+        self._is_closed = True
+        self.cancel()
+        with self._lock:
+            timers = list(self._timers)
+            self._timers.clear()
+        for i in timers:
+            i.cancel()
+        pools = [i for i in (self._copy_pool, self._image_pool,
+                             self._submit_pool) if i is not None]
+        for i in pools:
+            i.close()
+        for i in pools:
+            i.join()
+        self._copy_pool = None
+        self._image_pool = None
+        self._submit_pool = None
+
+    def wait(self, timeout=None):
+        """Block until all tasks are done.
+
+        Returns:
+            bool: False if timeout.
+        """
+
+        return self._finished.wait(timeout)
+
+    def _run(self, stage, task, args=(), attempt=0):
+        if stage == STAGE_COPY:
+            self._queue_copies([(task.copy_priority(), self._copy,
+                                 (task,) + tuple(args), attempt)])
+            return
+        pool, func = {
+            STAGE_COPY: (self._copy_pool, self._copy),
+            STAGE_IMAGE: (self._image_pool, self._image),
+            STAGE_SUBMIT: (self._submit_pool, self._submit),
+        }[stage]
+        if self._is_closed or pool is None:
+            return
+        pool.apply_async(func, (task,) + tuple(args), {'attempt': attempt})
+
+    def _queue_copies(self, items):
+        """Queue copies, a copy worker takes the best one when free.
+
+        Args:
+            items (list[tuple]): Priority, function, arguments
+                and attempt of each copy.
+        """
+
+        pool = self._copy_pool
+        if self._is_closed or pool is None:
+            return
+        with self._lock:
+            for priority, func, args, attempt in items:
+                heapq.heappush(self._copy_queue, (
+                    priority, next(self._copy_counter), func, args, attempt))
+        for _ in items:
+            pool.apply_async(self._copy_next)
+
+    def _copy_next(self):
+        with self.copy_limit:
+            with self._lock:
+                _, _, func, args, attempt = heapq.heappop(self._copy_queue)
+            func(*args, attempt=attempt)
+
+    def _on_copy_progress(self, size):
+        if self._is_closed:
+            raise TaskCancelledError()
+        self.bandwidth.consume(size)
+        self.copy_limit.add(size)
+
+    def _record_done(self, task, error):
+        if self.journal is None or task.journal_id is None:
+            return
+        if error is None:
+            self.journal.set_stage(task.journal_id, STAGE_DONE)
+        elif not isinstance(error, TaskCancelledError):
+            self.journal.set_stage(
+                task.journal_id, STAGE_FAILED, six.text_type(error))
+        elif not self._is_closed:
+            self.journal.set_stage(task.journal_id, STAGE_CANCELLED)
+
+    def _set_stage(self, task, stage):
+        if self.journal is not None and task.journal_id is not None:
+            self.journal.set_stage(task.journal_id, stage)
+
+    def _retry(self, stage, task, error, attempt, args=()):
+        """Run stage again later, or finish task when out of retries.  """
+
+        # pylint: disable=too-many-arguments
+        if self.journal is not None and task.journal_id is not None:
+            self.journal.add_attempt(task.journal_id, six.text_type(error))
+        if (attempt >= self.retries or self.is_cancelled
+                or isinstance(error, PERMANENT_ERRORS)):
+            self._done(task, error)
+            return
+        delay = self.retry_delay * 2 ** attempt
+        LOGGER.info('Retry %s in %.1fs: %s', stage, delay, task)
+        STATS.count('upload.retry')
+
+        def _run():
+            with self._lock:
+                self._timers.discard(timer)
+            self._run(stage, task, args, attempt + 1)
+
+        timer = threading.Timer(delay, _run)
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def _copy(self, task, attempt=0):
+        if self.is_cancelled:
+            self._done(task, TaskCancelledError())
+            return
+        try:
+            if task.frames:
+                if not os.path.isdir(task.dst):
+                    os.makedirs(task.dst)
+            else:
+                copy_file(task, self.manifest, self._on_copy_progress)
+        except Exception as ex:  # pylint: disable=broad-except
+            LOGGER.error('Copy failed: %s', task, exc_info=True)
+            self._retry(STAGE_COPY, task, ex, attempt)
+            return
+        if not task.frames:
+            self._set_stage(task, STAGE_IMAGE)
+            self._run(STAGE_IMAGE, task)
+            return
+        # Shared by frames: remaining count, done count, first error.
+        progress = [len(task.frames), 0, None]
+        priority = task.copy_priority()
+        self._queue_copies([
+            (priority, self._copy_frame, (task, progress, src, dst), attempt)
+            for src, dst in task.frames])
+
+    def _copy_frame(self, task, progress, src, dst, attempt=0):
+        # pylint: disable=too-many-arguments
+        error = None
+        if self.is_cancelled:
+            error = TaskCancelledError()
+        else:
+            try:
+                copy_frame(src, dst, self._on_copy_progress)
+            except Exception as ex:  # pylint: disable=broad-except
+                LOGGER.error('Copy frame failed: %s', src, exc_info=True)
+                error = ex
+        with self._lock:
+            progress[0] -= 1
+            progress[1] += 1
+            if progress[2] is None:
+                progress[2] = error
+            is_last = progress[0] == 0
+            done, error = progress[1], progress[2]
+        self.on_task_progress(task, done, len(task.frames))
+        if not is_last:
+            return
+        if error is not None:
+            # Frames already copied are skipped on retry.
+            self._retry(STAGE_COPY, task, error, attempt)
+            return
+        self._set_stage(task, STAGE_IMAGE)
+        self._run(STAGE_IMAGE, task)
+
+    def _image(self, task, attempt=0):
+        if self.is_cancelled:
+            self._done(task, TaskCancelledError())
+            return
+        try:
+            entry = task.entry()
+            image = set_image(task, entry)
+        except Exception as ex:  # pylint: disable=broad-except
+            LOGGER.error('Set image failed: %s', task, exc_info=True)
+            self._retry(STAGE_IMAGE, task, ex, attempt)
+            return
+        if not task.is_submit:
+            self._done(task, None)
+            return
+        self._set_stage(task, STAGE_SUBMIT)
+        self._run(STAGE_SUBMIT, task, (entry, [image] if image else []))
+
+    def _submit(self, task, entry=None, images=(), attempt=0):
+        if self.is_cancelled:
+            self._done(task, TaskCancelledError())
+            return
+        try:
+            # Entry is not kept in journal, query it for resumed task.
+            submit_file(task, entry or task.entry(), images)
+        except Exception as ex:  # pylint: disable=broad-except
+            LOGGER.error('Submit failed: %s', task, exc_info=True)
+            self._retry(STAGE_SUBMIT, task, ex, attempt, (entry, images))
+            return
+        # Record first, a resumed submit would submit twice.
+        self._done(task, None)
+
+    def _done(self, task, error):
+        try:
+            self._record_done(task, error)
+        except:  # pylint: disable=bare-except
+            LOGGER.error('Record task failed: %s', task, exc_info=True)
+        with self._lock:
+            self._remaining -= 1
+            is_last = self._remaining == 0
+        self.on_task_finished(task, error)
+        if is_last:
+            self._finished.set()
+            self.on_finished()
@@ -5,7 +5,9 @@ from __future__ import (absolute_import, division, print_function,
 
 import logging
 import os
-import cgtwq
+
+import six
+
 from wlf.config import Config as _Config
 
 
@@ -22,7 +24,28 @@ class Config(_Config):
         'SCENE': '',
         'MODE': 1,
         'IS_SUBMIT': 2,
-        'IS_BURN_IN': 2
+        'IS_BURN_IN': 2,
+        'IS_RECURSIVE': 0,
+        'CACHE_TTL': 24 * 60 * 60,
+        'CACHE_SIZE': 100000,
+        # Cached results older than this are re-resolved in background.
+        'CACHE_REVALIDATE_SECONDS': 60 * 60,
+        'WORKERS': 16,
+        'PREFETCH_PIPELINES': [],
+        'SHOW_STATS': False,
+        'UPLOAD_COPY_WORKERS': 4,
+        # Copy speed limit to server, 0 for no limit.
+        'UPLOAD_BYTES_PER_SECOND': 0,
+        # Adjust concurrent copies by measured throughput,
+        # up to `UPLOAD_COPY_WORKERS`.
+        'UPLOAD_ADAPTIVE': True,
+        'UPLOAD_SUBMIT_WORKERS': 2,
+        'UPLOAD_IMAGE_WORKERS': 2,
+        'UPLOAD_RETRIES': 3,
+        'UPLOAD_RETRY_DELAY': 2,
+        # Unfinished uploads older than this are not resumed.
+        'UPLOAD_RESUME_SECONDS': 3 * 24 * 60 * 60,
+        'FFMPEG': 'ffmpeg',
     }
     path = os.path.expanduser('~/.wlf.uploader.json')
 
@@ -35,6 +58,9 @@ LOGGER = logging.getLogger('com.wlf.uploader')
 def l10n(obj):
     """Localization.  """
 
+    # Dialog imports this module before first paint, cgtwq is slow to import.
+    import cgtwq
+
     ret = obj
     if isinstance(ret, cgtwq.LoginError):
         ret = '需要登录CGTeamWork'
@@ -44,4 +70,4 @@ def l10n(obj):
     elif isinstance(ret, cgtwq.IDError):
         ret = 'CGTW上未找到对应镜头'
 
-    return unicode(ret)
+    return six.text_type(ret)
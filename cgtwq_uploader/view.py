@@ -5,14 +5,14 @@ from __future__ import (absolute_import, division, print_function,
 
 import webbrowser
 
-from Qt.QtCore import QEvent, Qt, Signal
-from Qt.QtWidgets import QStyle
+from Qt.QtCore import QEvent, QTimer, Signal
+from Qt.QtWidgets import QLabel, QMessageBox, QStyle
 
 from wlf.uitools.template.dialog_with_dir import DialogWithDir
 
 from . import filetools
 from .__about__ import __version__
-from .control import Controller
+from .stats import STATS
 from .util import CONFIG
 
 
@@ -34,8 +34,32 @@ class Dialog(DialogWithDir):
         DialogWithDir.__init__(self, config=CONFIG, parent=parent)
         self.is_uploading = False
         self.version_label.setText('v{}'.format(__version__))
+        self.controller = None
+
+        # Timing panel for slow path reports.
+        if CONFIG['SHOW_STATS']:
+            self.labelStats = QLabel(self)
+            self.statusBar.addPermanentWidget(self.labelStats)
+            self.stats_timer = QTimer(self)
+            self.stats_timer.timeout.connect(self.on_stats_timer)
+            self.stats_timer.start(1000)
+
+    def showEvent(self, event):
+        """Override.  """
+        # pylint: disable=invalid-name
+
+        super(Dialog, self).showEvent(event)
+        if self.controller is None and not event.spontaneous():
+            # Let window paint before heavy import and refresh.
+            QTimer.singleShot(0, self.setup_controller)
+
+    def setup_controller(self):
+        """Create controller then start refresh.  """
+
+        if self.controller is not None:
+            return
+        from .control import Controller
 
-        # Set controller
         self.controller = Controller(self)
         self.controller.widget = self
         self.listView.setModel(self.controller.model)
@@ -45,8 +69,14 @@ class Dialog(DialogWithDir):
         self.listView.clicked.connect(self.on_view_item_clicked)
         self.listView.doubleClicked.connect(self.on_view_item_double_clicked)
 
+        self.checkBoxRecursive.stateChanged.connect(
+            self.controller.change_recursive)
         self.comboBoxPipeline.currentIndexChanged.connect(
             lambda index: self.on_pipeline_changed(self.comboBoxPipeline.itemText(index)))
+        for text, _ in self.controller.status_filters:
+            self.comboBoxStatus.addItem(text)
+        self.comboBoxStatus.currentIndexChanged.connect(
+            self.on_status_filter_changed)
 
         self.actionDir.triggered.connect(self.ask_dir)
         self.actionSync.triggered.connect(self.on_action_sync)
@@ -55,20 +85,46 @@ class Dialog(DialogWithDir):
         self.actionReverseSelection.triggered.connect(
             self.controller.reverse_selection)
         self.actionReset.triggered.connect(
-            self.controller.update_model)
+            self.controller.reset)
         self.actionOpenDir.triggered.connect(
             lambda: webbrowser.open(CONFIG['DIR']))
 
         self.controller.root_changed.connect(self.on_root_changed)
         self.controller.upload_started.connect(self.on_upload_started)
         self.controller.upload_finished.connect(self.on_upload_finished)
+        self.controller.upload_progress.connect(self.on_upload_progress)
+        self.controller.upload_failed.connect(self.on_upload_failed)
+        self.controller.frame_progress.connect(self.on_frame_progress)
         self.controller.model.dataChanged.connect(self.on_data_changed)
+        self.labelCount.installEventFilter(self)
 
         # Recover state.
         self.controller.pipeline = CONFIG['PIPELINE']
+        self.controller.is_recursive = bool(CONFIG['IS_RECURSIVE'])
         self.controller.change_root(self.directory)
+        self.ask_resume_upload()
+
+    def ask_resume_upload(self):
+        """Ask user whether to continue uploads left by last run.  """
+
+        count = self.controller.pending_upload_count()
+        if not count:
+            return
+        answer = QMessageBox.question(
+            self, '继续上传',
+            '上次有 {} 个上传任务未完成, 包括提交, 是否继续?\n'
+            '选择否将放弃这些任务.'.format(count),
+            QMessageBox.Yes | QMessageBox.No)
+        if answer != QMessageBox.Yes:
+            self.controller.discard_pending_upload()
+            return
+        if self.controller.resume_upload():
+            self.statusBar.showMessage('继续上次未完成的上传')
 
     def on_action_sync(self):
+        if self.is_uploading:
+            self.controller.cancel_upload()
+            return
         self.controller.upload(
             self.checkBoxSubmit.checkState(),
             self.lineEditNote.text())
@@ -79,6 +135,7 @@ class Dialog(DialogWithDir):
             'dirEdit': 'DIR',
             'checkBoxSubmit': 'IS_SUBMIT',
             'checkBoxBurnIn': 'IS_BURN_IN',
+            'checkBoxRecursive': 'IS_RECURSIVE',
             'comboBoxPipeline': 'PIPELINE',
         }
 
@@ -104,22 +161,66 @@ class Dialog(DialogWithDir):
     def on_pipeline_changed(self, pipeline):
         self.controller.change_pipeline(pipeline)
 
+    def on_status_filter_changed(self, index):
+        self.controller.change_status_filter(
+            self.controller.status_filters[index][1])
+        self.on_data_changed()
+
     def on_data_changed(self):
         model = self.controller.model
-        states = [model.data(i, Qt.CheckStateRole) for i in model.indexes()]
-        checked_count = len([i for i in states if i == Qt.Checked])
-        total_count = len(states)
+        checked_count = model.checked_count()
+        total_count = model.rowCount(model.root_index())
         self.labelCount.setText('{}/{}'.format(checked_count, total_count))
-        self.syncButton.setEnabled(not self.is_uploading and checked_count)
+        self.syncButton.setEnabled(
+            self.is_uploading or bool(checked_count))
+
+    def on_stats_timer(self):
+        self.labelStats.setText(STATS.summary())
+        self.labelStats.setToolTip(
+            '<pre>{}</pre>'.format(STATS.dumps(indent=2)))
 
     def on_upload_started(self):
         self.is_uploading = True
-        self.syncButton.setEnabled(False)
+        self.syncButton.setText('取消上传')
+        self.syncButton.setEnabled(True)
+
+    def on_upload_progress(self, done, total, label):
+        self.statusBar.showMessage('上传 {}/{}: {}'.format(done, total, label))
+
+    def on_frame_progress(self, label, done, total):
+        self.statusBar.showMessage('上传 {}: {}/{}帧'.format(label, done, total))
+
+    def on_upload_failed(self, label, reason):
+        self.statusBar.showMessage('上传失败: {}: {}'.format(label, reason))
 
     def on_upload_finished(self):
         self.is_uploading = False
+        self.syncButton.setText('上传')
+        self.on_data_changed()
         self.activateWindow()
 
+    def closeEvent(self, event):
+        """Override.  """
+        # pylint: disable=invalid-name
+
+        if self.controller is not None:
+            self.controller.close()
+        super(Dialog, self).closeEvent(event)
+
+    def eventFilter(self, obj, event):
+        """Override.  """
+        # pylint: disable=invalid-name
+
+        if obj is self.labelCount and event.type() == QEvent.ToolTip:
+            # Status counts cost O(rows), so only count on hover.
+            model = self.controller.model
+            self.labelCount.setToolTip('已选择/显示\n' + ', '.join(
+                '{}: {}'.format(
+                    text, sum(model.status_count(i) for i in statuses))
+                for text, statuses in self.controller.status_filters
+                if statuses))
+        return super(Dialog, self).eventFilter(obj, event)
+
     def event(self, event):
         """Override.  """
 
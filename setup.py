@@ -12,7 +12,7 @@ with codecs.open("VERSION", "r", encoding="utf-8") as fh:
 setup(
     name="cgtwq_uploader",
     version=version,
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     description="Uploader application for CGTeamwork.",
     long_description=long_description,
     long_description_content_type="text/markdown",
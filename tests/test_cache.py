@@ -0,0 +1,81 @@
+# -*- coding=UTF-8 -*-
+"""Test disk cache for resolve results.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import pytest
+
+from cgtwq_uploader import cache
+from cgtwq_uploader.resolve import Resolution
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(name='clock')
+def _clock(monkeypatch):
+    ret = _Clock()
+    monkeypatch.setattr(cache.time, 'time', ret)
+    return ret
+
+
+def _resolution(filename, pipeline='合成'):
+    return Resolution(filename, pipeline, 'proj_bench', 'shot', 'id-0',
+                      'Z:/submit', 'account', 'artist', None)
+
+
+def test_get_many(tmpdir, clock):
+    # pylint: disable=unused-argument
+    db = cache.ResolveCache(str(tmpdir.join('cache.db')))
+    resolutions = [_resolution('a.mov'),
+                   Resolution.failed('b.mov', '合成', '找不到对应任务')]
+    db.put_many(resolutions)
+    assert db.get_many(['a.mov', 'b.mov', 'c.mov'], '合成') == {
+        i.filename: i for i in resolutions}
+    assert db.get_many(['a.mov'], '灯光') == {}
+
+
+def test_ttl(tmpdir, clock):
+    db = cache.ResolveCache(str(tmpdir.join('cache.db')), ttl=10)
+    db.put_many([_resolution('a.mov')])
+    clock.now += 9
+    assert list(db.get_many(['a.mov'], '合成')) == ['a.mov']
+    clock.now += 1
+    assert db.get_many(['a.mov'], '合成') == {}
+
+
+def test_lru(tmpdir, clock):
+    db = cache.ResolveCache(str(tmpdir.join('cache.db')), size=2)
+    db.put_many([_resolution('a.mov'), _resolution('b.mov')])
+    clock.now += 1
+    db.get_many(['a.mov'], '合成')
+    clock.now += 1
+    db.put_many([_resolution('c.mov')])
+    assert sorted(db.get_many(['a.mov', 'b.mov', 'c.mov'], '合成')) == [
+        'a.mov', 'c.mov']
+
+
+def test_stale(tmpdir, clock):
+    db = cache.ResolveCache(str(tmpdir.join('cache.db')))
+    db.put_many([_resolution('a.mov')])
+    clock.now += 5
+    db.put_many([_resolution('b.mov')])
+    assert db.stale(['a.mov', 'b.mov', 'c.mov'], '合成', 5) == {'a.mov'}
+
+
+def test_invalidate(tmpdir, clock):
+    # pylint: disable=unused-argument
+    db = cache.ResolveCache(str(tmpdir.join('cache.db')))
+    db.put_many([_resolution('a.mov'), _resolution('b.mov'),
+                 _resolution('a.mov', '灯光')])
+    db.invalidate(['a.mov'])
+    assert list(db.get_many(['a.mov', 'b.mov'], '合成')) == ['b.mov']
+    assert db.get_many(['a.mov'], '灯光') == {}
+    db.invalidate()
+    assert db.get_many(['b.mov'], '合成') == {}
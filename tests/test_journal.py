@@ -0,0 +1,100 @@
+# -*- coding=UTF-8 -*-
+"""Test durable record of upload tasks.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import pytest
+
+from cgtwq_uploader import journal
+from cgtwq_uploader.resolve import Resolution
+from cgtwq_uploader.upload import UploadTask
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(name='clock')
+def _clock(monkeypatch):
+    ret = _Clock()
+    monkeypatch.setattr(journal.time, 'time', ret)
+    return ret
+
+
+@pytest.fixture(name='path')
+def _path(tmpdir):
+    return str(tmpdir.join('journal.db'))
+
+
+def _task(name):
+    return UploadTask(
+        name, 'E:/{}.mov'.format(name), 'Z:/{}.mov'.format(name), True,
+        '合成', 'note',
+        Resolution('{}.mov'.format(name), '合成', 'proj_bench', 'shot',
+                   'id-0', 'Z:/', 'account', 'artist', None))
+
+
+def test_pending(path):
+    db = journal.UploadJournal(path)
+    sequence = _task('b')._replace(
+        frames=[('E:/b.1001.exr', 'Z:/b/b.1001.exr')])
+    ids = db.add_many([_task('a'), sequence])
+    pending = db.pending()
+    assert [(i, stage) for i, stage, _ in pending] == [
+        (ids[0], journal.STAGE_COPY), (ids[1], journal.STAGE_COPY)]
+    assert pending[0][2]['resolution'] == _task('a').resolution
+    assert pending[1][2]['frames'] == sequence.frames
+    assert UploadTask(**pending[1][2]) == sequence
+
+
+def test_finish(path):
+    db = journal.UploadJournal(path)
+    ids = db.add_many([_task('a'), _task('b'), _task('c')])
+    assert db.add_attempt(ids[0], 'error') == 1
+    assert db.add_attempt(ids[0], 'error') == 2
+    db.set_stage(ids[0], journal.STAGE_SUBMIT)
+    assert db.add_attempt(ids[0], 'error') == 1
+    db.set_stage(ids[1], journal.STAGE_DONE)
+    db.set_stage(ids[2], journal.STAGE_FAILED, 'error')
+    assert [(i, stage) for i, stage, _ in db.pending()] == [
+        (ids[0], journal.STAGE_SUBMIT)]
+
+
+def test_prune(path, clock):
+    db = journal.UploadJournal(path)
+    ids = db.add_many([_task('a'), _task('b')])
+    db.set_stage(ids[0], journal.STAGE_DONE)
+    db.close()
+    clock.now += 20
+    db = journal.UploadJournal(path, keep_seconds=10)
+    # Pending tasks are kept.
+    assert [i for i, _, _ in db.pending()] == [ids[1]]
+    count = db._connect().execute(  # pylint: disable=protected-access
+        'SELECT COUNT(*) FROM task').fetchone()[0]
+    assert count == 1
+
+
+def test_expire(path, clock):
+    db = journal.UploadJournal(path)
+    ids = db.add_many([_task('a')])
+    clock.now += 20
+    ids.extend(db.add_many([_task('b')]))
+    db.close()
+    clock.now += 5
+    db = journal.UploadJournal(path, pending_seconds=10)
+    assert [i for i, _, _ in db.pending()] == [ids[1]]
+    assert db.cancel_pending() == 1
+    assert db.pending() == []
+
+
+def test_reopen(path):
+    db = journal.UploadJournal(path)
+    db.add_many([_task('a')])
+    db.close()
+    assert len(db.pending()) == 1
+    db.close()
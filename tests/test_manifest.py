@@ -0,0 +1,92 @@
+# -*- coding=UTF-8 -*-
+"""Test local record of uploaded files.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import pytest
+
+from cgtwq_uploader import manifest
+
+
+@pytest.fixture(name='compares')
+def _compares(monkeypatch):
+    """Full compares called, compare by content.  """
+
+    ret = []
+
+    def _is_same(src, dst):
+        ret.append((src, dst))
+        with open(src, 'rb') as f_src, open(dst, 'rb') as f_dst:
+            return f_src.read() == f_dst.read()
+    monkeypatch.setattr(manifest, 'is_same', _is_same)
+    return ret
+
+
+@pytest.fixture(name='files')
+def _files(tmpdir):
+    src, dst = tmpdir.join('src.mov'), tmpdir.join('dst.mov')
+    src.write_binary(b'content')
+    src.copy(dst, mode=True)
+    return str(src), str(dst)
+
+
+@pytest.fixture(name='db')
+def _db(tmpdir):
+    return manifest.UploadManifest(str(tmpdir.join('manifest.db')))
+
+
+def _touch(path, offset=10):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + offset))
+
+
+def test_recorded(db, files, compares):
+    db.record(*files)
+    assert db.is_uploaded(*files)
+    assert not compares
+
+
+def test_not_recorded(db, files, compares):
+    assert db.is_uploaded(*files)
+    assert len(compares) == 1
+    # Recorded after full compare.
+    assert db.is_uploaded(*files)
+    assert len(compares) == 1
+
+
+def test_source_touched(db, files, compares):
+    db.record(*files)
+    _touch(files[0])
+    # Same content found by hash.
+    assert db.is_uploaded(*files)
+    assert not compares
+
+
+def test_source_changed(db, files, compares):
+    db.record(*files)
+    with open(files[0], 'wb') as f:
+        f.write(b'CONTENT')
+    _touch(files[0])
+    assert not db.is_uploaded(*files)
+    assert len(compares) == 1
+    # Record removed.
+    assert not db.is_uploaded(*files)
+    assert len(compares) == 2
+
+
+def test_destination_changed(db, files, compares):
+    db.record(*files)
+    with open(files[1], 'wb') as f:
+        f.write(b'other')
+    assert not db.is_uploaded(*files)
+    assert len(compares) == 1
+
+
+def test_destination_missing(db, files, monkeypatch):
+    db.record(*files)
+    os.remove(files[1])
+    monkeypatch.setattr(manifest, 'is_same', lambda src, dst: False)
+    assert not db.is_uploaded(*files)
@@ -0,0 +1,100 @@
+# -*- coding=UTF-8 -*-
+"""Test batch resolve against fake server.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import pytest
+
+from benchmarks import fake_cgtwq
+from cgtwq_uploader import resolve
+
+
+@pytest.fixture(name='modules')
+def _modules(monkeypatch, tmpdir):
+    server = fake_cgtwq.FakeServer(
+        ['SNJYW_EP01_01', 'SNJYW_EP01_02', 'SNJYW_EP01_03'], str(tmpdir),
+        latency=0)
+    ret = fake_cgtwq._make_modules(server)  # pylint: disable=protected-access
+    helper = ret['cgtwq.helper.wlf']
+    monkeypatch.setattr(resolve, 'cgtwq', ret['cgtwq'])
+    monkeypatch.setattr(resolve, 'get_entry_by_file', helper.get_entry_by_file)
+    monkeypatch.setattr(resolve, 'DatabaseError', helper.DatabaseError)
+    ret['server'] = server
+    return ret
+
+
+def _module_type(modules):
+    return type(modules['cgtwq'].Database(fake_cgtwq.DATABASE).module(
+        fake_cgtwq.MODULE))
+
+
+def _filebox_type(modules):
+    return type(modules['cgtwq'].Database(fake_cgtwq.DATABASE).module(
+        fake_cgtwq.MODULE).select('id-0').to_entry().filebox)
+
+
+def test_submit_dir_error_fails_entry_only(modules, monkeypatch):
+    filebox = _filebox_type(modules)
+    get_submit = filebox.get_submit
+
+    def _get_submit(self):
+        if self.entry.data[1] == 'SNJYW_EP01_02':
+            raise ValueError('No submit filebox.')
+        return get_submit(self)
+    monkeypatch.setattr(filebox, 'get_submit', _get_submit)
+
+    result = {i.filename: i for i in resolve.resolve_files(
+        ['SNJYW_EP01_01_v1.mov', 'SNJYW_EP01_02_v1.mov'], '合成')}
+    assert result['SNJYW_EP01_01_v1.mov'].error is None
+    assert result['SNJYW_EP01_01_v1.mov'].submit_dir
+    assert result['SNJYW_EP01_02_v1.mov'].error == 'No submit filebox.'
+
+
+def test_resolve_files_batch(modules):
+    server = modules['server']
+    filenames = ['SNJYW_EP01_01_v1.mov', 'SNJYW_EP01_01_v2.mov',
+                 'SNJYW_EP01_02_v1.mov', 'SNJYW_EP01_03_v1.mov',
+                 'SNJYW_EP01_09_v1.mov']
+    result = {i.filename: i for i in resolve.resolve_files(filenames, '合成')}
+    assert sorted(result) == sorted(filenames)
+    assert result['SNJYW_EP01_01_v2.mov'].entry_id == 'id-0'
+    assert result['SNJYW_EP01_03_v1.mov'].entry_id == 'id-2'
+    assert result['SNJYW_EP01_03_v1.mov'].submit_dir
+    assert result['SNJYW_EP01_09_v1.mov'].error == '找不到对应任务'
+    # One lookup and one select for the database,
+    # submit folder once per entry.
+    assert server.calls['get_entry_by_file'] == 1
+    assert server.calls['module.filter'] == 1
+    assert server.calls['filebox.get_submit'] == 3
+
+
+def test_resolve_files_first_not_found(modules):
+    server = modules['server']
+    result = {i.filename: i for i in resolve.resolve_files(
+        ['SNJYW_EP01_09_v1.mov', 'SNJYW_EP01_01_v1.mov',
+         'SNJYW_EP01_02_v1.mov'], '合成')}
+    assert result['SNJYW_EP01_09_v1.mov'].error == '找不到对应任务'
+    assert result['SNJYW_EP01_01_v1.mov'].entry_id == 'id-0'
+    assert result['SNJYW_EP01_02_v1.mov'].entry_id == 'id-1'
+    assert server.calls['get_entry_by_file'] == 2
+    assert server.calls['module.filter'] == 1
+
+
+def test_resolve_files_batch_fallback(modules, monkeypatch):
+    server = modules['server']
+
+    def _filter(self, expr):
+        # pylint: disable=unused-argument
+        raise RuntimeError('Select failed.')
+    monkeypatch.setattr(_module_type(modules), 'filter', _filter)
+
+    filenames = ['SNJYW_EP01_01_v1.mov', 'SNJYW_EP01_02_v1.mov',
+                 'SNJYW_EP01_09_v1.mov']
+    result = {i.filename: i for i in resolve.resolve_files(filenames, '合成')}
+    assert result['SNJYW_EP01_01_v1.mov'].entry_id == 'id-0'
+    assert result['SNJYW_EP01_02_v1.mov'].entry_id == 'id-1'
+    assert result['SNJYW_EP01_02_v1.mov'].error is None
+    assert result['SNJYW_EP01_09_v1.mov'].error == '找不到对应任务'
+    # Every file goes to helper.
+    assert server.calls['get_entry_by_file'] == len(filenames)
@@ -0,0 +1,49 @@
+# -*- coding=UTF-8 -*-
+"""Test image sequence detection.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from cgtwq_uploader.sequence import group_files, resolve_name, split_frame
+
+
+def test_split_frame():
+    assert (split_frame('SNJYW_EP01_01_v2.1001.exr')
+            == ('SNJYW_EP01_01_v2.####.exr', 1001))
+    assert split_frame('SNJYW_EP01_01.0001.PNG') == (
+        'SNJYW_EP01_01.####.PNG', 1)
+
+
+def test_split_frame_not_frame():
+    assert split_frame('SNJYW_EP01_01_v2.mov') is None
+    assert split_frame('SNJYW_EP01_01.1001.mov') is None
+    assert split_frame('SNJYW_EP01_01.12.exr') is None
+    assert split_frame('SNJYW_EP01_001.png') is None
+    assert split_frame('SNJYW_EP01_01_1001.exr') is None
+
+
+def test_group_files():
+    files, sequences = group_files([
+        'SNJYW_EP01_01_v2.1002.exr',
+        'SNJYW_EP01_01_v2.1001.exr',
+        'SNJYW_EP01_02.1001.exr',
+        'SNJYW_EP01_03.mov',
+    ])
+    assert sorted(files) == ['SNJYW_EP01_02.1001.exr', 'SNJYW_EP01_03.mov']
+    assert sequences == {
+        'SNJYW_EP01_01_v2.1001.exr': [
+            'SNJYW_EP01_01_v2.1001.exr', 'SNJYW_EP01_01_v2.1002.exr']}
+
+
+def test_group_files_per_shot_stills():
+    names = ['SNJYW_EP01_001.png', 'SNJYW_EP01_002.png',
+             'SNJYW_EP01_003.png']
+    files, sequences = group_files(names)
+    assert sorted(files) == names
+    assert not sequences
+
+
+def test_resolve_name():
+    assert resolve_name('SNJYW_EP01_01_v2.1001.exr') == 'SNJYW_EP01_01_v2.exr'
+    assert resolve_name('SNJYW_EP01_001.png') == 'SNJYW_EP01_001.png'
+    assert resolve_name('SNJYW_EP01_01_v2.mov') == 'SNJYW_EP01_01_v2.mov'
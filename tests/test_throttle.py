@@ -0,0 +1,104 @@
+# -*- coding=UTF-8 -*-
+"""Test bandwidth limit and adaptive concurrency.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import pytest
+
+from cgtwq_uploader import throttle
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture(name='clock')
+def _clock(monkeypatch):
+    ret = _Clock()
+    monkeypatch.setattr(throttle.time, 'time', ret)
+    monkeypatch.setattr(throttle.time, 'sleep', ret.sleep)
+    return ret
+
+
+def test_token_bucket(clock):
+    bucket = throttle.TokenBucket(100)
+    bucket.consume(50)
+    assert clock.slept == pytest.approx(0.5)
+    bucket.consume(100)
+    assert clock.slept == pytest.approx(1.5)
+
+
+def test_token_bucket_idle(clock):
+    bucket = throttle.TokenBucket(100)
+    clock.now += 10
+    # Allowance of one second is kept.
+    bucket.consume(100)
+    assert clock.slept == 0
+    bucket.consume(100)
+    assert clock.slept == pytest.approx(1)
+
+
+def test_token_bucket_no_limit(clock):
+    throttle.TokenBucket(0).consume(1024)
+    assert clock.slept == 0
+
+
+def _measure(limit, clock, size, active=None):
+    """Run `active` transfers for one interval, defaults to limit.  """
+
+    active = limit.limit if active is None else active
+    for _ in range(active):
+        limit.__enter__()
+    clock.now += limit.interval
+    limit.add(size * limit.interval)
+    for _ in range(active):
+        limit.__exit__(None, None, None)
+
+
+def test_adaptive_limit(clock):
+    limit = throttle.AdaptiveLimit(4, interval=5)
+    assert limit.limit == 2
+    _measure(limit, clock, 100)
+    assert limit.limit == 3
+    _measure(limit, clock, 200)
+    assert limit.limit == 4
+    # Throughput dropped, turn back.
+    _measure(limit, clock, 100)
+    assert limit.limit == 3
+    # Throughput is flat, hold.
+    _measure(limit, clock, 100)
+    assert limit.limit == 3
+    _measure(limit, clock, 105)
+    assert limit.limit == 3
+
+
+def test_adaptive_limit_not_saturated(clock):
+    limit = throttle.AdaptiveLimit(4, interval=5)
+    _measure(limit, clock, 100, active=1)
+    _measure(limit, clock, 200, active=1)
+    assert limit.limit == 2
+
+
+def test_adaptive_limit_bounds(clock):
+    limit = throttle.AdaptiveLimit(2, minimum=2, interval=5)
+    assert limit.limit == 2
+    _measure(limit, clock, 100)
+    _measure(limit, clock, 50)
+    assert limit.limit == 2
+
+
+def test_fixed_limit(clock):
+    limit = throttle.AdaptiveLimit(4, is_adaptive=False)
+    assert limit.limit == 4
+    _measure(limit, clock, 100)
+    assert limit.limit == 4
@@ -0,0 +1,99 @@
+# -*- coding=UTF-8 -*-
+"""Test resumable file transfer.  """
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import pytest
+
+from cgtwq_uploader import transfer
+
+CHUNK_SIZE = 16
+
+
+class _Abort(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def _checkpoint_each_chunk(monkeypatch):
+    monkeypatch.setattr(transfer, 'CHECKPOINT_INTERVAL', 1)
+
+
+def _copy(src, dst):
+    """Copy and return copied bytes count.  """
+
+    copied = []
+    transfer.copy(src, dst, CHUNK_SIZE, copied.append)
+    return sum(copied)
+
+
+def _interrupted_copy(src, dst, chunks):
+    """Copy then abort in progress callback of given chunk.
+
+    Checkpoint of the aborted chunk is not saved.
+    """
+
+    copied = []
+
+    def _on_progress(size):
+        copied.append(size)
+        if len(copied) >= chunks:
+            raise _Abort
+
+    with pytest.raises(_Abort):
+        transfer.copy(src, dst, CHUNK_SIZE, _on_progress)
+
+
+@pytest.fixture(name='src')
+def _src(tmpdir):
+    ret = tmpdir.join('src.mov')
+    ret.write_binary(os.urandom(CHUNK_SIZE * 5 + 3))
+    return ret
+
+
+def test_copy(tmpdir, src):
+    dst = tmpdir.join('sub', 'dst.mov')
+    assert _copy(str(src), str(dst)) == src.size()
+    assert dst.read_binary() == src.read_binary()
+    assert not os.path.exists(str(dst) + transfer.PART_SUFFIX)
+    assert not os.path.exists(str(dst) + transfer.CHECKPOINT_SUFFIX)
+
+
+def test_resume(tmpdir, src):
+    dst = tmpdir.join('dst.mov')
+    _interrupted_copy(str(src), str(dst), 3)
+    assert not dst.check()
+    assert _copy(str(src), str(dst)) == src.size() - CHUNK_SIZE * 2
+    assert dst.read_binary() == src.read_binary()
+
+
+def test_resume_truncated_part(tmpdir, src):
+    dst = tmpdir.join('dst.mov')
+    _interrupted_copy(str(src), str(dst), 3)
+    part = tmpdir.join('dst.mov' + transfer.PART_SUFFIX)
+    part.write_binary(part.read_binary()[:CHUNK_SIZE])
+    assert _copy(str(src), str(dst)) == src.size()
+    assert dst.read_binary() == src.read_binary()
+
+
+def test_resume_corrupted_part(tmpdir, src):
+    dst = tmpdir.join('dst.mov')
+    _interrupted_copy(str(src), str(dst), 3)
+    part = tmpdir.join('dst.mov' + transfer.PART_SUFFIX)
+    data = bytearray(part.read_binary())
+    # Last chunk before checkpoint offset is verified.
+    data[CHUNK_SIZE * 2 - 1] ^= 1
+    part.write_binary(bytes(data))
+    assert _copy(str(src), str(dst)) == src.size()
+    assert dst.read_binary() == src.read_binary()
+
+
+def test_resume_changed_source(tmpdir, src):
+    dst = tmpdir.join('dst.mov')
+    _interrupted_copy(str(src), str(dst), 3)
+    src.write_binary(os.urandom(CHUNK_SIZE * 4))
+    assert _copy(str(src), str(dst)) == src.size()
+    assert dst.read_binary() == src.read_binary()